@@ -0,0 +1,154 @@
+import re
+import time
+from local_catalog import HEBREW_PREFIXES, tokenize
+from storage import SQLiteStore
+
+# מטמון ניתוחי GPT לפי הצורה המנורמלת של ההודעה
+ANALYSIS_CACHE_PATH = 'analysis_cache.sqlite3'
+ANALYSIS_CACHE_TTL = 7 * 24 * 3600
+ANALYSIS_CACHE_MAX_ENTRIES = 5000
+ANALYSIS_KEY_VERSION = 2  # עולה כשצורת המפתח משתנה - רשומות בפורמט ישן לא מוגשות
+MIN_STEM_LENGTH = 3  # אות שימוש מוסרת רק אם נשארת מילה באורך הזה (או מילה מוכרת)
+
+# מילים שלא משנות את הניתוח ("רוצה פודקאסט על ספורט" == "ספורט")
+STOPWORDS = {
+    'רוצה', 'אני', 'אשמח', 'תן', 'תני', 'לי', 'תמליץ', 'תמליצי', 'המלצה', 'המלצות', 'ממליץ',
+    'על', 'של', 'את', 'משהו', 'פודקאסט', 'פודקאסטים', 'פודקסט', 'בבקשה', 'אפשר', 'יש',
+    'איזה', 'איזשהו', 'טוב', 'טובה', 'טובים', 'מקסימום', 'בערך', 'מאשר',
+    'podcast', 'podcasts', 'a', 'an', 'the', 'about', 'on', 'of', 'some', 'something', 'i', 'want',
+    'me', 'please', 'recommend', 'recommendation', 'for', 'in', 'up', 'to', 'max', 'than',
+}
+
+# מילות שלילה והשוואה משנות את משמעות המילה שאחריהן ("בלי כדורגל" / "עם כדורגל", "עד 10 דקות" / "מעל 10 דקות"):
+# הן נשארות במפתח, מחוברות למילה שהן חלות עליה
+OPERATOR_WORDS = {
+    'בלי', 'ללא', 'עם', 'לא', 'מעל', 'עד', 'פחות', 'יותר',
+    'without', 'with', 'no', 'not', 'over', 'under', 'less', 'more',
+}
+
+# שפה - עברית היא ברירת המחדל של הניתוח ולכן לא משנה את המפתח
+LANGUAGE_WORDS = {'אנגלית': 'english', 'english': 'english', 'עברית': None, 'hebrew': None}
+
+NUMBER_WORDS = {
+    'שתי': 2, 'שלוש': 3, 'ארבע': 4, 'חמש': 5, 'עשר': 10, 'רבע': 15, 'עשרים': 20, 'חצי': 30,
+    'שלושים': 30, 'ארבעים': 40, 'חמישים': 50, 'שישים': 60,
+    'five': 5, 'ten': 10, 'fifteen': 15, 'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60,
+}
+_NUMBER = r'\b(\d+|' + '|'.join(NUMBER_WORDS) + r')'
+_MINUTES_PATTERN = re.compile(_NUMBER + r"\s*(?:דקות|דקה|דק'|min\w*)")
+_HOURS_PATTERN = re.compile(_NUMBER + r'\s*(?:שעות|hours?)')
+_FRACTION_HOUR_PATTERN = re.compile(r'(רבע|חצי)\s*שעה|half an hour|quarter of an hour')
+_HOUR_PATTERN = re.compile(r'שעה וחצי|שעה|an hour|hour')
+
+
+def _number(word):
+    return int(word) if word.isdigit() else NUMBER_WORDS[word]
+
+
+def _normalize_durations(text):
+    """ביטויי זמן -> טוקן אחיד בדקות: 'חצי שעה' / '30 דקות' / 'thirty minutes' -> dur30"""
+    text = _MINUTES_PATTERN.sub(lambda m: f' dur{_number(m.group(1))} ', text)
+    text = _HOURS_PATTERN.sub(lambda m: f' dur{_number(m.group(1)) * 60} ', text)
+    text = _FRACTION_HOUR_PATTERN.sub(lambda m: ' dur15 ' if m.group(0) in ('רבע שעה', 'quarter of an hour') else ' dur30 ', text)
+    return _HOUR_PATTERN.sub(lambda m: ' dur90 ' if m.group(0) == 'שעה וחצי' else ' dur60 ', text)
+
+
+def _stem(token):
+    """הסרה של אות שימוש אחת לכל היותר ('בספורט' -> 'ספורט'), רק כשהשארית היא מילה מוכרת או ארוכה מספיק,
+    ואף פעם לא לתוך מילת קישור ('מעל' נשאר 'מעל', לא 'על')"""
+    if len(token) < 2 or token[0] not in HEBREW_PREFIXES:
+        return token
+    rest = token[1:]
+    if rest in STOPWORDS:
+        return token
+    if rest in OPERATOR_WORDS or rest in LANGUAGE_WORDS or len(rest) >= MIN_STEM_LENGTH:
+        return rest
+    return token
+
+
+def normalize_request(text):
+    """הצורה הקנונית של הודעה: זמנים אחידים, בלי מילות קישור ובלי חשיבות לסדר המילים.
+    מילות שלילה והשוואה נשמרות מחוברות למילה שאחריהן ('בלי:דורגל', 'מעל:dur10')"""
+    parts = set()
+    operators = []
+    for token in tokenize(_normalize_durations(text.lower())):
+        # אות שימוש שנותקה מהמספר ("מ-10 דקות")
+        if token in STOPWORDS or (len(token) == 1 and token in HEBREW_PREFIXES):
+            continue
+        stem = token if token.startswith('dur') else _stem(token)
+        if stem in OPERATOR_WORDS:
+            operators.append(stem)
+            continue
+        if stem in LANGUAGE_WORDS:
+            language = LANGUAGE_WORDS[stem]
+            if language:
+                parts.add(':'.join(operators + [f'lang:{language}']))
+            elif operators:
+                parts.add(':'.join(operators + ['lang:hebrew']))
+            operators = []
+            continue
+        parts.add(':'.join(operators + [stem]))
+        operators = []
+    if operators:
+        parts.add(':'.join(operators))
+    return ' '.join(sorted(parts))
+
+
+class AnalysisCache:
+    """מטמון תוצאות ניתוח לפי ההודעה המנורמלת - תוקף קבוע, פינוי LRU ושמירה בדיסק.
+    get / set / stats ניגשים ל-SQLite וחוסמים - מהלולאה קוראים להם דרך asyncio.to_thread"""
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, ttl=ANALYSIS_CACHE_TTL, max_entries=ANALYSIS_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.store = SQLiteStore(path, table='analyses', max_entries=max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text):
+        normalized = normalize_request(text)
+        return f'v{ANALYSIS_KEY_VERSION} {normalized}' if normalized else None
+
+    def get(self, text):
+        """הניתוח השמור להודעה (עותק חדש בכל קריאה) או None"""
+        key = self._key(text)
+        if not key:
+            return None
+        entry = self.store.get(key)
+        if entry is None or time.time() - entry[1] >= self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, text, analysis):
+        key = self._key(text)
+        if key:
+            self.store.set(key, analysis)
+
+    def hit_rate(self):
+        """בלי גישה לדיסק - מהמונים בזיכרון"""
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 3) if lookups else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+            'entries': len(self.store),
+        }
+
+    def close(self):
+        self.store.close()
+
+
+_analysis_cache = None
+
+
+def get_analysis_cache():
+    """מטמון הניתוחים המשותף לתהליך"""
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache()
+    return _analysis_cache
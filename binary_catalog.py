@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import sys
+import time
+import numpy as np
+from local_catalog import KeywordIndex, LocalCatalog, StringColumn
+
+# הקטלוג המקומי בפורמט בינארי: העמודות והאינדקס מחושבים פעם אחת מה-CSV ונטענים ב-mmap,
+# כך שהעלייה לא מפרסרת CSV ולא בונה אינדקס, וכמה תהליכים על אותה מכונה חולקים את אותם דפים
+CATALOG_DIR = 'catalog'
+CATALOG_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+KEEP_GENERATIONS = 2  # הגרסה הנוכחית והקודמת (תהליך שעוד ממפה אותה לא נשבר)
+
+
+def _write_strings(directory, name, column):
+    np.asarray(column.data, dtype=np.uint8).tofile(os.path.join(directory, name + '.bin'))
+    np.save(os.path.join(directory, name + '.offsets.npy'), np.asarray(column.offsets, dtype=np.int64))
+
+
+def _read_strings(directory, name):
+    path = os.path.join(directory, name + '.bin')
+    # np.memmap לא מסכים למפות קובץ ריק
+    data = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else np.empty(0, dtype=np.uint8)
+    return StringColumn(data, np.load(os.path.join(directory, name + '.offsets.npy'), mmap_mode='r'))
+
+
+def source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def build_catalog(csv_path, out_dir=CATALOG_DIR, previous=None):
+    """בניית הקטלוג הבינארי מה-CSV לתיקיית גרסה חדשה והחלפה אטומית של ה-manifest.
+    previous - הבנייה הקודמת (אם יש): רק שורות שהשתנו עוברות אינדוקס מחדש"""
+    import pandas as pd
+    from text_similarity import get_similarity_backend
+
+    started = time.perf_counter()
+    # חותמת הקובץ לפני הקריאה - שינוי שקורה תוך כדי יזוהה כקטלוג לא עדכני
+    source = source_stamp(csv_path)
+    # הקטלוג הבינארי שומר רק את העמודות והאינדקס - מנוע הדמיון נבחר בטעינה
+    catalog = LocalCatalog(pd.read_csv(csv_path), similarity=get_similarity_backend('sequence'), previous=previous)
+    manifest = write_catalog(catalog, source, out_dir)
+    print(f"✅ נבנה קטלוג בינארי ({len(catalog)} פודקאסטים, {catalog.reindexed_rows} שורות אונדקסו) "
+          f"ב-{time.perf_counter() - started:.2f} שניות")
+    return manifest
+
+
+def write_catalog(catalog, source, out_dir=CATALOG_DIR):
+    """שמירת קטלוג בנוי לתיקיית גרסה חדשה והחלפה אטומית של ה-manifest (source - חותמת ה-CSV שממנו נבנה)"""
+    generation = f"gen-{time.time_ns()}"
+    directory = os.path.join(out_dir, generation)
+    os.makedirs(directory)
+
+    _write_strings(directory, 'text', catalog.text)
+    for column in LocalCatalog.DISPLAY_COLUMNS:
+        _write_strings(directory, 'display_' + column, catalog.display[column])
+    for column in LocalCatalog.ARRAY_COLUMNS:
+        np.save(os.path.join(directory, column + '.npy'), np.asarray(getattr(catalog, column)))
+    _write_strings(directory, 'index_vocabulary', StringColumn.from_strings(catalog.index.vocabulary))
+    np.save(os.path.join(directory, 'index_rows.npy'), catalog.index.rows)
+    np.save(os.path.join(directory, 'index_offsets.npy'), catalog.index.offsets)
+
+    manifest = {
+        'version': CATALOG_FORMAT_VERSION,
+        'generation': generation,
+        'rows': len(catalog),
+        'source': source,
+    }
+    temporary = os.path.join(out_dir, MANIFEST_NAME + '.tmp')
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(temporary, os.path.join(out_dir, MANIFEST_NAME))
+
+    generations = sorted(name for name in os.listdir(out_dir) if name.startswith('gen-'))
+    for name in generations[:-KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+    return manifest
+
+
+def load_catalog(out_dir=CATALOG_DIR, csv_path=None, similarity=None, generation=None):
+    """הקטלוג הבינארי ממופה מהדיסק, או None אם אין קטלוג / הפורמט ישן / ה-CSV השתנה מאז הבנייה.
+    generation - גרסה מסוימת (כל עוד לא נמחקה) במקום זו שב-manifest"""
+    manifest = _read_manifest(out_dir)
+    if manifest is None or manifest.get('version') != CATALOG_FORMAT_VERSION:
+        return None
+    if csv_path is not None and os.path.exists(csv_path) and manifest.get('source') != source_stamp(csv_path):
+        return None
+
+    generation = generation or manifest['generation']
+    directory = os.path.join(out_dir, generation)
+    try:
+        text = _read_strings(directory, 'text')
+        columns = {column: np.load(os.path.join(directory, column + '.npy'), mmap_mode='r')
+                   for column in LocalCatalog.ARRAY_COLUMNS}
+        display = {column: _read_strings(directory, 'display_' + column) for column in LocalCatalog.DISPLAY_COLUMNS}
+        index = KeywordIndex.from_arrays(
+            _read_strings(directory, 'index_vocabulary'),
+            np.load(os.path.join(directory, 'index_rows.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'index_offsets.npy'), mmap_mode='r')
+        )
+    except FileNotFoundError:
+        return None
+    catalog = LocalCatalog.from_columns(text, columns, display, index, similarity)
+    catalog.generation = generation
+    return catalog
+
+
+def _measure(kind, csv_path, out_dir):
+    """זמן טעינה וזיכרון שיא של תהליך נקי - נקרא בתהליך נפרד מ-compare"""
+    import resource
+
+    started = time.perf_counter()
+    if kind == 'csv':
+        import pandas as pd
+        catalog = LocalCatalog(pd.read_csv(csv_path))
+    else:
+        catalog = load_catalog(out_dir, csv_path)
+        if catalog is None:
+            raise SystemExit(f"❌ אין קטלוג בינארי עדכני ב-{out_dir}")
+    seconds = time.perf_counter() - started
+    # ru_maxrss בקילובייטים בלינוקס
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'kind': kind, 'rows': len(catalog), 'seconds': round(seconds, 3), 'peak_rss_mb': round(peak_mb, 1)}))
+
+
+def compare(csv_path, out_dir=CATALOG_DIR):
+    """השוואת זמן עלייה וזיכרון: CSV + בניית אינדקס מול הקטלוג הבינארי (כל אחד בתהליך נקי)"""
+    import subprocess
+
+    for kind in ('csv', 'binary'):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), 'measure', kind, csv_path, out_dir],
+                                capture_output=True, text=True, check=True)
+        print(result.stdout.strip())
+
+
+if __name__ == '__main__':
+    # שימוש: python binary_catalog.py build|compare [podcast_dataset.csv] [catalog]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if command == 'measure':
+        _measure(sys.argv[2], sys.argv[3], sys.argv[4])
+    else:
+        dataset = sys.argv[2] if len(sys.argv) > 2 else 'podcast_dataset.csv'
+        catalog_dir = sys.argv[3] if len(sys.argv) > 3 else CATALOG_DIR
+        if command == 'build':
+            build_catalog(dataset, catalog_dir)
+        elif command == 'compare':
+            compare(dataset, catalog_dir)
+        else:
+            raise SystemExit(f"Unknown command: {command}")
@@ -0,0 +1,64 @@
+import os
+import threading
+
+CATALOG_RELOAD = True  # לטעון מחדש את הדטהסט כשהקובץ משתנה, בלי להפעיל את הבוט מחדש
+CATALOG_RELOAD_INTERVAL = 30  # כל כמה שניות בודקים אם הקובץ השתנה
+
+
+class CatalogReloader:
+    """מעקב אחרי קובץ הדטהסט: כשהוא משתנה בונים קטלוג חדש ב-thread של המעקב, והפונקציה rebuild
+    מחליפה אותו בהשמה אחת. בקשה שכבר רצה ממשיכה עם הקטלוג שהחזיקה - אף פעם לא רואה אינדקס חצי בנוי"""
+
+    def __init__(self, path, rebuild, interval=CATALOG_RELOAD_INTERVAL):
+        self.path = path
+        self.rebuild = rebuild
+        self.interval = interval
+        self._loaded = self._stamp()  # החותמת של הקובץ שממנו נבנה הקטלוג הנוכחי
+        self._pending = self._loaded
+        self._stop = threading.Event()
+        self._thread = None
+        self.reloads = 0
+        self.failures = 0
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def check(self):
+        """טעינה מחדש אם הקובץ השתנה והתייצב מאז הבדיקה הקודמת; מחזיר True אם הוחלף קטלוג"""
+        stamp = self._stamp()
+        if stamp is None or stamp == self._loaded:
+            return False
+        if stamp != self._pending:
+            # הקובץ אולי עדיין נכתב - בונים רק כשהוא לא השתנה בין שתי בדיקות
+            self._pending = stamp
+            return False
+
+        self._loaded = stamp
+        try:
+            self.rebuild()
+        except Exception as e:
+            # הקטלוג הקודם נשאר בשימוש; ננסה שוב כשהקובץ ישתנה
+            self.failures += 1
+            print(f"❌ שגיאה בטעינה מחדש של {self.path}: {e}")
+            return False
+        self.reloads += 1
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='catalog-reloader', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,612 @@
+import re
+import numpy as np
+from difflib import SequenceMatcher
+from text_similarity import get_similarity_backend
+
+SCORE_THRESHOLD = 0.3  # סף מינימלי לקבלת פודקאסט
+LOCAL_RESULTS_LIMIT = 50  # כמה תוצאות מקומיות מחזירים (top-k)
+EXACT_BATCH_SIZE = 256  # כמה מועמדים מחשבים במדויק בכל סבב
+
+# ציון לא מעוגל שנמוך מהסף בפחות מחצי יחידה בספרה השלישית עדיין עשוי להתעגל אליו
+_ROUNDING_MARGIN = 0.0005 + 1e-9
+# מפריד בין השדות בטקסט המאוחד - לא יכול להופיע במונח חיפוש
+_FIELD_SEPARATOR = '\x00'
+
+# אותיות שימוש שמתחברות לתחילת מילה בעברית (ו/ה/ב/ל/מ/ש/כ)
+HEBREW_PREFIXES = 'והבלמשכ'
+MAX_PREFIX_LETTERS = 3
+MIN_STEM_LENGTH = 2
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """פיצול טקסט לטוקנים (lowercase)"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def token_variants(token):
+    """הטוקן וגרסאותיו בלי אותיות השימוש שבתחילתו: 'ובספורט' -> ובספורט, בספורט, ספורט"""
+    variants = [token]
+    while (len(variants) <= MAX_PREFIX_LETTERS and token[0] in HEBREW_PREFIXES
+           and len(token) - 1 >= MIN_STEM_LENGTH):
+        token = token[1:]
+        variants.append(token)
+    return variants
+
+
+class StringColumn:
+    """עמודת מחרוזות כ-blob אחד של UTF-8 ומערך offsets. אפשר למפות את שניהם מהדיסק (mmap),
+    כך שכמה תהליכים חולקים את אותם דפים בלי להעתיק; מחרוזת מפוענחת רק כשניגשים אליה"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return self.data[self.offsets[position]:self.offsets[position + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    def take(self, rows):
+        return [self[position] for position in rows]
+
+
+class KeywordIndex:
+    """אינדקס הפוך: טוקן (כולל גרסאות בלי אותיות שימוש) -> מספרי השורות שמכילות אותו.
+
+    אוצר המילים ממוין, והשורות של כל הטוקנים רצופות במערך אחד (rows) עם offsets - פורמט שאפשר לשמור ולמפות מהדיסק.
+    מונח בשאילתה מותאם לכל מילה שמכילה אותו (גם באמצע מילה - כמו term in text בחישוב השורתי):
+    חיפוש תת-מחרוזת ב-blob של אוצר המילים, ולא בטקסט של כל השורות"""
+
+    def __init__(self, texts):
+        postings = {}
+        for row, text in enumerate(texts):
+            for token in set(tokenize(text)):
+                for variant in token_variants(token):
+                    postings.setdefault(variant, []).append(row)
+
+        # השורות נכנסות בסדר עולה, אבל טוקן יכול להופיע פעמיים באותה שורה דרך גרסאות שונות
+        self.vocabulary = sorted(postings)
+        token_rows = [np.unique(np.array(postings[token], dtype=np.int64)) for token in self.vocabulary]
+        self.offsets = np.zeros(len(token_rows) + 1, dtype=np.int64)
+        np.cumsum([len(rows) for rows in token_rows], out=self.offsets[1:])
+        self.rows = np.concatenate(token_rows) if token_rows else np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, vocabulary, rows, offsets):
+        """אינדקס ממערכים מוכנים (למשל ממופים מהקטלוג הבינארי)"""
+        index = cls.__new__(cls)
+        index.vocabulary = vocabulary
+        index.rows = rows
+        index.offsets = offsets
+        return index
+
+    @classmethod
+    def incremental(cls, previous, previous_texts, texts):
+        """אינדקס לטקסטים החדשים על בסיס האינדקס הקודם: רק שורות שהטקסט שלהן השתנה (או חדשות) עוברות טוקניזציה,
+        ושורות שלא השתנו רק מקבלות את המספר החדש שלהן. התוצאה זהה לבנייה מאפס.
+
+        מחזיר (אינדקס, מספר השורות שאונדקסו מחדש)"""
+        old_rows = {}
+        for row, text in enumerate(previous_texts):
+            old_rows.setdefault(text, []).append(row)
+
+        # מספר השורה הישנה -> מספרה החדש (-1 אם נמחקה או השתנתה)
+        mapping = np.full(len(previous_texts), -1, dtype=np.int64)
+        postings = {}
+        reindexed = 0
+        for row, text in enumerate(texts):
+            rows = old_rows.get(text)
+            if rows:
+                mapping[rows.pop()] = row
+                continue
+            reindexed += 1
+            for token in set(tokenize(text)):
+                for variant in token_variants(token):
+                    postings.setdefault(variant, []).append(row)
+
+        previous_vocabulary = list(previous.vocabulary)
+        vocabulary = sorted(set(previous_vocabulary).union(postings))
+        position = {token: index for index, token in enumerate(vocabulary)}
+
+        # זוגות (טוקן, שורה) מהאינדקס הקודם אחרי מיפוי השורות, ועוד הזוגות של השורות שאונדקסו מחדש
+        old_tokens = np.repeat(np.array([position[token] for token in previous_vocabulary], dtype=np.int64),
+                               np.diff(np.asarray(previous.offsets)))
+        old_rows_mapped = mapping[np.asarray(previous.rows)]
+        kept = old_rows_mapped >= 0
+        new_tokens = [position[token] for token, rows in postings.items() for _ in rows]
+        new_rows = [row for rows in postings.values() for row in rows]
+        tokens = np.concatenate([old_tokens[kept], np.array(new_tokens, dtype=np.int64)])
+        rows = np.concatenate([old_rows_mapped[kept], np.array(new_rows, dtype=np.int64)])
+
+        # מיון לפי טוקן ואז שורה, בלי כפילויות (טוקן שהגיע מכמה מילים באותה שורה)
+        order = np.lexsort((rows, tokens))
+        tokens, rows = tokens[order], rows[order]
+        unique = np.ones(len(rows), dtype=bool)
+        unique[1:] = (tokens[1:] != tokens[:-1]) | (rows[1:] != rows[:-1])
+        tokens, rows = tokens[unique], rows[unique]
+
+        # טוקנים שכל השורות שלהם נמחקו יוצאים מאוצר המילים
+        counts = np.bincount(tokens, minlength=len(vocabulary))
+        offsets = np.zeros(np.count_nonzero(counts) + 1, dtype=np.int64)
+        np.cumsum(counts[counts > 0], out=offsets[1:])
+        vocabulary = [token for token, count in zip(vocabulary, counts) if count]
+        return cls.from_arrays(vocabulary, rows, offsets), reindexed
+
+    def _postings(self, position):
+        return self.rows[self.offsets[position]:self.offsets[position + 1]]
+
+    def _vocabulary_blob(self):
+        """אוצר המילים כ-bytes אחד ו-offsets (מהקטלוג הבינארי - העמודה הממופה עצמה)"""
+        if getattr(self, '_blob', None) is None:
+            column = self.vocabulary if isinstance(self.vocabulary, StringColumn) else StringColumn.from_strings(self.vocabulary)
+            self._blob = (column.data.tobytes(), np.asarray(column.offsets))
+        return self._blob
+
+    def containing(self, token):
+        """מיקומי המילים באוצר המילים שמכילות את הטוקן (ספורט -> ספורטאים, כדורספורט)"""
+        blob, offsets = self._vocabulary_blob()
+        needle = token.encode('utf-8')
+        # כל המופעים, גם חופפים; מופע שחוצה גבול בין שתי מילים לא נחשב
+        starts = np.fromiter((match.start() for match in re.finditer(b'(?=' + re.escape(needle) + b')', blob)),
+                             dtype=np.int64)
+        positions = np.searchsorted(offsets, starts, side='right') - 1
+        positions = positions[starts + len(needle) <= offsets[positions + 1]]
+        return np.unique(positions)
+
+    def token_rows(self, token):
+        """השורות שיש בהן מילה שמכילה את הטוקן"""
+        matches = [self._postings(position) for position in self.containing(token)]
+        if not matches:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(matches))
+
+    def term_rows(self, term):
+        """מונח מרובה מילים - חיתוך הרשימות של כל הטוקנים שלו (None אם אין בו אף טוקן)"""
+        rows = None
+        for token in tokenize(term):
+            token_rows = self.token_rows(token)
+            rows = token_rows if rows is None else np.intersect1d(rows, token_rows, assume_unique=True)
+            if len(rows) == 0:
+                break
+        return rows
+
+    def candidates(self, terms):
+        """איחוד השורות של כל המונחים (ממוין). None - צריך לדרג את כל הדטהסט: אין מונחים,
+        או שיש מונח בלי טוקנים (רווח / פיסוק) שהחישוב השורתי מוצא גם מחוץ למילים"""
+        matches = [self.term_rows(term) for term in terms]
+        if not matches or any(rows is None for rows in matches):
+            return None
+        return np.unique(np.concatenate(matches))
+
+
+class LocalCatalog:
+    """הדטהסט המקומי עם עמודות מנורמלות, מערכים מחושבים מראש ואינדקס מילות מפתח, לדירוג וקטורי.
+
+    הציונים זהים לאלה של SimilarityScorer.calculate_similarity_score (70% נושאים + 30% מטאדטה)"""
+
+    # עמודות גולמיות לתצוגה (לבניית Podcast) שנשמרות לצד עמודות הדירוג
+    DISPLAY_COLUMNS = ('name', 'publisher', 'description', 'url', 'language')
+    # המערכים המספריים של הקטלוג (גם שמות הקבצים בקטלוג הבינארי)
+    ARRAY_COLUMNS = ('name_length', 'description_length', 'is_hebrew', 'is_english', 'duration', 'total_episodes')
+
+    def __init__(self, df, similarity=None, previous=None):
+        """previous - קטלוג קודם (טעינה מחדש): רק שורות שהטקסט שלהן השתנה עוברות אינדוקס מחדש"""
+        df = df.reset_index(drop=True)
+
+        # טקסט מנורמל (lowercase) - מחושב פעם אחת בטעינה
+        name = self._text_column(df, 'name', 'Unknown')
+        description = self._text_column(df, 'description', '', keep_nan=True)
+        publisher = self._text_column(df, 'publisher', 'Unknown')
+
+        # שפה כמערכים
+        if 'language' in df:
+            language = df['language']
+            has_language = language.notna()
+            language = language.where(has_language, '').map(str)
+            is_hebrew = (has_language & language.isin(['he', 'iw'])).to_numpy()
+            is_english = (has_language & language.str.contains('en', regex=False)).to_numpy()
+        else:
+            is_hebrew = is_english = np.zeros(len(df), dtype=bool)
+
+        # מחברים בפייתון - עמודות המחרוזות של pandas לא שומרות תו NUL
+        texts = [_FIELD_SEPARATOR.join(fields) for fields in zip(name, description, publisher)]
+        if previous is not None:
+            index, self.reindexed_rows = KeywordIndex.incremental(previous.index, previous.text, texts)
+        else:
+            index, self.reindexed_rows = KeywordIndex(texts), len(texts)
+
+        self._setup(
+            text=StringColumn.from_strings(texts),
+            columns={
+                'name_length': name.str.len().to_numpy(dtype=np.int64),
+                'description_length': description.str.len().to_numpy(dtype=np.int64),
+                'is_hebrew': is_hebrew,
+                'is_english': is_english,
+                'duration': self._numeric_column(df, 'duration_minutes'),
+                'total_episodes': self._numeric_column(df, 'total_episodes'),
+            },
+            display={column: self._display_column(df, column) for column in self.DISPLAY_COLUMNS},
+            index=index,
+            similarity=similarity
+        )
+
+    @classmethod
+    def from_columns(cls, text, columns, display, index, similarity=None):
+        """קטלוג מעמודות מוכנות (הקטלוג הבינארי) - בלי pandas ובלי לבנות את האינדקס מחדש"""
+        catalog = cls.__new__(cls)
+        catalog._setup(text, columns, display, index, similarity)
+        return catalog
+
+    def _setup(self, text, columns, display, index=None, similarity=None):
+        self.generation = None  # גרסת הקטלוג הבינארי שממנה נטען (תהליכי ה-scoring pool טוענים את אותה גרסה)
+        self.text = text  # name \0 description \0 publisher, lowercase
+        for column in self.ARRAY_COLUMNS:
+            setattr(self, column, columns[column])
+        self.display = display
+        self.index = index if index is not None else KeywordIndex(text)
+        self.similarity = similarity or get_similarity_backend()
+
+        # מנוע דמיון וקטורי (TF-IDF) - וקטורים לכל פודקאסט מחושבים מראש, עם IDF משלו לקטלוג הזה
+        if self.similarity.vectorized:
+            fields = [value.split(_FIELD_SEPARATOR) for value in self.text]
+            names = [name for name, _, _ in fields]
+            descriptions = [description for _, description, _ in fields]
+            self.similarity = self.similarity.fitted(names + descriptions)
+            self.name_vectors = self.similarity.transform(names)
+            self.description_vectors = self.similarity.transform(descriptions)
+
+    def __len__(self):
+        return len(self.text)
+
+    def name_at(self, index):
+        return self.text[index].split(_FIELD_SEPARATOR)[0]
+
+    def description_at(self, index):
+        return self.text[index].split(_FIELD_SEPARATOR)[1]
+
+    def record(self, index):
+        """הערכים הגולמיים של שורה (לבניית Podcast); ערך חסר -> None"""
+        row = {column: self.display[column][index] or None for column in self.DISPLAY_COLUMNS}
+        row['description'] = self.display['description'][index]
+        row['duration_minutes'] = _display_number(self.duration[index])
+        row['total_episodes'] = _display_number(self.total_episodes[index])
+        return row
+
+    @staticmethod
+    def _text_column(df, column, default, keep_nan=False):
+        import pandas as pd  # רק לבנייה מ-DataFrame; הקטלוג הבינארי נטען בלי pandas
+
+        if column not in df:
+            return pd.Series([default.lower()] * len(df), dtype=object)
+        values = df[column]
+        if not keep_nan:
+            values = values.fillna('')
+        # map(str) הופך NaN ל-'nan' - בדיוק כמו str() בגרסה השורתית
+        return values.map(str).str.lower()
+
+    @staticmethod
+    def _numeric_column(df, column):
+        # עמודה חסרה מתנהגת כמו 0 (לא נבדקת); NaN נשאר NaN כמו בגרסה השורתית
+        import pandas as pd
+
+        if column not in df:
+            return np.zeros(len(df))
+        return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _display_column(df, column):
+        if column not in df:
+            return StringColumn.from_strings([''] * len(df))
+        values = df[column]
+        # התיאור מוצג כמו str() בגרסה השורתית (NaN -> 'nan'); בשאר העמודות ערך חסר נשמר ריק
+        if column != 'description':
+            values = values.fillna('')
+        return StringColumn.from_strings(values.map(str))
+
+    def metadata_scores(self, analysis, rows):
+        """ציון מטאדטה (30%) לשורות הנתונות - מקביל ל-calculate_metadata_similarity"""
+        is_hebrew = self.is_hebrew[rows]
+        is_english = self.is_english[rows]
+        duration = self.duration[rows]
+        total_episodes = self.total_episodes[rows]
+
+        metadata_score = np.zeros(len(rows))
+        checks = np.zeros(len(rows), dtype=np.int64)
+
+        # בדיקת שפה (50% מהמטאדטה)
+        user_language = analysis.get('language_preference')
+        if user_language:
+            checks += 1
+            if user_language == 'hebrew':
+                metadata_score += np.where(is_hebrew, 0.5, 0.0)
+            elif user_language == 'english':
+                metadata_score += np.where(is_english, 0.5, 0.0)
+
+        # בדיקת משך זמן (30% מהמטאדטה) - NaN נחשב "קיים" ונבדק, כמו בגרסה השורתית
+        user_max_duration = analysis.get('duration_max')
+        if user_max_duration:
+            has_duration = duration != 0
+            checks += has_duration
+            with np.errstate(invalid='ignore'):
+                fits = has_duration & (duration <= user_max_duration)
+                duration_ratio = 1 - (duration / user_max_duration)
+                metadata_score += np.where(fits, 0.3 * (0.5 + 0.5 * duration_ratio), 0.0)
+
+        # בדיקת כמות פרקים (20% מהמטאדטה)
+        with np.errstate(invalid='ignore'):
+            has_episodes = total_episodes > 0
+            checks += has_episodes
+            metadata_score += np.where(
+                has_episodes & (total_episodes >= 5) & (total_episodes <= 100), 0.2,
+                np.where(total_episodes > 100, 0.1, 0.0)
+            )
+
+        return np.where(checks > 0, metadata_score, 0.5)
+
+    def direct_scores(self, topics, keywords, rows):
+        """חלק ההתאמות הישירות בציון הנושאים לשורות הנתונות"""
+        texts = self.text.take(rows)
+        direct_matches = np.zeros(len(rows), dtype=np.int64)
+        for term, weight in [(topic, 2) for topic in topics] + [(keyword, 1) for keyword in keywords]:
+            term = term.lower()
+            direct_matches += weight * np.fromiter((term in text for text in texts), dtype=np.int64, count=len(texts))
+
+        total_terms = len(topics) + len(keywords)
+        return np.minimum(direct_matches / (total_terms * 2), 1.0)
+
+    @staticmethod
+    def _ratio_upper_bound(query_length, lengths):
+        """חסם עליון ל-SequenceMatcher.ratio לפי אורכים בלבד (כמו real_quick_ratio)"""
+        total = query_length + lengths
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, 2.0 * np.minimum(query_length, lengths) / total, 1.0)
+
+    def text_similarities(self, query, rows):
+        """דמיון טקסט (המקסימום בין שם לתיאור) לשורות הנתונות במנוע הווקטורי"""
+        return np.maximum(
+            self.similarity.similarities(query, self.name_vectors[rows]),
+            self.similarity.similarities(query, self.description_vectors[rows])
+        )
+
+    def score(self, analysis, limit=LOCAL_RESULTS_LIMIT, pool=None):
+        """דירוג הדטהסט - מחזיר [(מספר שורה, ציון)] של ה-top-k מעל הסף, בסדר יורד.
+
+        כשיש נושאים/מילות מפתח מדרגים רק את השורות שהאינדקס מחזיר עבורם (ולא את כל הדטהסט).
+        pool - ScoringPool לחישוב הציונים המדויקים של אצוות גדולות בתהליכים אחרים (אותם ציונים בדיוק)"""
+        n = len(self)
+        if n == 0:
+            return []
+
+        topics = analysis.get('topics', [])
+        keywords = analysis.get('keywords', [])
+
+        rows = self.index.candidates(topics + keywords)
+        if rows is None:
+            rows = np.arange(n)
+        if len(rows) == 0:
+            return []
+
+        metadata = self.metadata_scores(analysis, rows)
+
+        if len(topics) + len(keywords) == 0:
+            # ציון נושאים נייטרלי - הכל וקטורי
+            return self._top_k(rows, self._round_scores((0.5 * 0.7) + (metadata * 0.3)), limit)
+
+        direct = self.direct_scores(topics, keywords, rows)
+        query = ' '.join(topics + keywords).lower()
+
+        if self.similarity.vectorized:
+            # כל דמיוני הטקסט במכפלה דלילה אחת - אין צורך בחסמים
+            topic_score = np.minimum((direct * 0.7) + (self.text_similarities(query, rows) * 0.3), 1.0)
+            return self._top_k(rows, self._round_scores((topic_score * 0.7) + (metadata * 0.3)), limit)
+
+        # חסם עליון לציון הסופי: דמיון הטקסט מוחלף בחסם לפי אורכים
+        similarity_bound = np.maximum(
+            self._ratio_upper_bound(len(query), self.name_length[rows]),
+            self._ratio_upper_bound(len(query), self.description_length[rows])
+        )
+        upper = (np.minimum((direct * 0.7) + (similarity_bound * 0.3), 1.0) * 0.7) + (metadata * 0.3)
+
+        candidates = np.flatnonzero(upper >= SCORE_THRESHOLD - _ROUNDING_MARGIN)
+        order = candidates[np.argsort(-upper[candidates], kind='stable')]
+
+        # ציון מדויק (עם SequenceMatcher) רק למועמדים שעדיין יכולים להיכנס ל-top-k
+        scores = np.full(len(rows), -np.inf)
+        batch_size = max(EXACT_BATCH_SIZE, (limit or 0) * 4)
+        if pool is not None:
+            # אצווה שמספיקה לכל תהליכי ה-pool; החיתוך נשאר מדויק בכל גודל אצווה
+            batch_size = max(batch_size, pool.batch_size)
+        for start in range(0, len(order), batch_size):
+            positions = order[start:start + batch_size]
+            arguments = (rows[positions], query, direct[positions], metadata[positions])
+            scores[positions] = pool.exact_scores(self, *arguments) if pool is not None else self.exact_scores(*arguments)
+
+            end = start + batch_size
+            if end >= len(order):
+                break
+            passing = scores[scores >= SCORE_THRESHOLD]
+            if limit is not None and len(passing) >= limit:
+                kth_score = np.partition(passing, len(passing) - limit)[len(passing) - limit]
+                if upper[order[end]] + _ROUNDING_MARGIN < kth_score:
+                    break
+
+        return self._top_k(rows, scores, limit)
+
+    def exact_scores(self, rows, query, direct, metadata):
+        """הציונים המדויקים לשורות (עם הציון הישיר וציון המטאדטה שכבר חושבו להן)"""
+        return [self._exact_score(row, query, direct_score, metadata_score)
+                for row, direct_score, metadata_score in zip(rows, direct, metadata)]
+
+    def _exact_score(self, index, query, direct_score, metadata_score):
+        name, description, _ = self.text[index].split(_FIELD_SEPARATOR)
+
+        name_similarity = SequenceMatcher(None, query, name).ratio()
+        # את התיאור מחשבים רק אם הוא יכול לעקוף את דמיון השם
+        description_bound = self._ratio_upper_bound(len(query), np.int64(len(description)))
+        if description_bound > name_similarity:
+            description_similarity = SequenceMatcher(None, query, description).ratio()
+        else:
+            description_similarity = 0.0
+        similarity_score = max(name_similarity, description_similarity)
+
+        topic_score = min((float(direct_score) * 0.7) + (similarity_score * 0.3), 1.0)
+        return round((topic_score * 0.7) + (float(metadata_score) * 0.3), 3)
+
+    @staticmethod
+    def _round_scores(values):
+        """round() של פייתון על מערך - דרך הערכים הייחודיים (np.round מעגל אחרת)"""
+        unique, inverse = np.unique(values, return_inverse=True)
+        return np.array([round(float(value), 3) for value in unique])[inverse]
+
+    @staticmethod
+    def _top_k(rows, scores, limit):
+        """בחירת top-k עם argpartition; בשוויון - לפי סדר השורות, כמו מיון יציב (rows ממוין)"""
+        indices = np.flatnonzero(scores >= SCORE_THRESHOLD)
+        if limit is not None and len(indices) > limit:
+            selected = scores[indices]
+            kth_score = selected[np.argpartition(-selected, limit - 1)[limit - 1]]
+            above = indices[selected > kth_score]
+            ties = indices[selected == kth_score][:limit - len(above)]
+            indices = np.concatenate([above, ties])
+
+        indices = indices[np.lexsort((indices, -scores[indices]))]
+        return [(int(rows[index]), float(scores[index])) for index in indices]
+
+
+def _display_number(value):
+    """ערך מספרי לתצוגה: NaN -> None, מספר שלם -> int (כמו בעמודה שלמה ב-CSV)"""
+    value = float(value)
+    if np.isnan(value):
+        return None
+    return int(value) if value.is_integer() else value
+
+
+# שורות שהשדות שלהן נוגעים זה בזה בגבול מילה: חיבור בלי מפריד יוצר מהן מונחים שלא קיימים באף שדה
+# ('abc sport' + 'ball game' -> 'sportball'), ולכן הן בודקות שהטקסט המאוחד שומר את המפריד
+BOUNDARY_CHECK_ROWS = [
+    {'name': 'abc sport', 'description': 'ball game', 'publisher': 'kan', 'language': 'en', 'duration_minutes': 30, 'total_episodes': 20},
+    {'name': 'חדשות הבוקר', 'description': 'ספורט', 'publisher': 'כאן', 'language': 'he', 'duration_minutes': 20, 'total_episodes': 150},
+    {'name': 'tech', 'description': 'news', 'publisher': 'daily', 'language': 'en', 'duration_minutes': None, 'total_episodes': 5},
+    {'name': 'ספורט', 'description': None, 'publisher': 'ball', 'language': None, 'duration_minutes': 45, 'total_episodes': None},
+    {'name': 'כדורספורט כדורגל', 'description': 'esports daily', 'publisher': 'x', 'language': 'he', 'duration_minutes': 25, 'total_episodes': 30},
+]
+BOUNDARY_CHECK_TERMS = ['sportball', 'sport ball', 'gamekan', 'בוקרספורט', 'ספורטכאן', 'technews', 'newsdaily', 'sport', 'ספורט', 'ball',
+                        'ורט', 'port', 'ports dai']
+
+
+def check_scores(df, analyses):
+    """השוואת הדירוג של הקטלוג לחישוב השורתי של SimilarityScorer על כל שורה שהוחזרה,
+    ולרשימה המלאה כשאין מונחים (סריקה של כל הדטהסט). בנוסף - המועמדים מהאינדקס חייבים לכלול כל שורה
+    שאחד המונחים מופיע בה (term in text בסריקה מלאה). מחזיר את אי-ההתאמות - רשימה ריקה אם הכל זהה.
+
+    שורות בלי שם או מפרסם לא נבדקות - החישוב השורתי המקורי נכשל עליהן (NaN.lower())"""
+    from podcast import Podcast
+    from shmali_bot import SimilarityScorer
+
+    df = df.reset_index(drop=True)
+    catalog = LocalCatalog(df)
+    # הרשומות נבנות מהערכים הגולמיים, כמו בחיפוש השורתי המקורי (תיאור חסר -> 'nan', משך NaN נשאר NaN)
+    podcasts = {
+        index: Podcast(
+            name=row.get('name', 'Unknown'),
+            publisher=row.get('publisher', 'Unknown'),
+            description=str(row.get('description', '')),
+            duration_minutes=row.get('duration_minutes'),
+            languages=[row['language']] if isinstance(row.get('language'), str) else [],
+            total_episodes=row.get('total_episodes', 0)
+        )
+        for index, row in enumerate(df.to_dict('records'))
+        if isinstance(row.get('name', 'Unknown'), str) and isinstance(row.get('publisher', 'Unknown'), str)
+    }
+    mismatches = []
+    for analysis in analyses:
+        expected = {index: SimilarityScorer.calculate_similarity_score(analysis, podcast, catalog.similarity)
+                    for index, podcast in podcasts.items()}
+        terms = [term.lower() for term in analysis.get('topics', []) + analysis.get('keywords', [])]
+        if terms:
+            candidates = catalog.index.candidates(terms)
+            matching = {index for index, podcast in podcasts.items()
+                        if any(term in field.lower() for term in terms
+                               for field in (podcast.name, podcast.description, podcast.publisher))}
+            missing = sorted(matching - set(range(len(df)) if candidates is None else candidates.tolist()))
+            if missing:
+                mismatches.append({'analysis': analysis, 'missing_candidates': missing[:20], 'count': len(missing)})
+        actual = [(index, score) for index, score in catalog.score(analysis, limit=None) if index in podcasts]
+        for index, score in actual:
+            if score != expected[index]:
+                mismatches.append({'analysis': analysis, 'row': index, 'expected': expected[index], 'actual': score})
+        if not analysis.get('topics') and not analysis.get('keywords'):
+            ranked = sorted(((index, score) for index, score in expected.items() if score >= SCORE_THRESHOLD),
+                            key=lambda item: item[1], reverse=True)
+            if ranked != actual:
+                mismatches.append({'analysis': analysis, 'expected': ranked, 'actual': actual})
+    return mismatches
+
+
+def check_index(df):
+    """השוואת האינדקס של הקטלוג לאינדקס שנבנה מכל שדה בנפרד (שם, תיאור, מפרסם): טוקן -> שורות.
+    מונח שנוצר מחיבור של שני שדות לא אמור להופיע באינדקס. מחזיר את אי-ההתאמות"""
+    df = df.reset_index(drop=True)
+    catalog = LocalCatalog(df)
+    name = LocalCatalog._text_column(df, 'name', 'Unknown')
+    description = LocalCatalog._text_column(df, 'description', '', keep_nan=True)
+    publisher = LocalCatalog._text_column(df, 'publisher', 'Unknown')
+
+    expected = {}
+    for row, fields in enumerate(zip(name, description, publisher)):
+        for token in {token for field in fields for token in tokenize(field)}:
+            for variant in token_variants(token):
+                expected.setdefault(variant, set()).add(row)
+
+    mismatches = []
+    vocabulary = list(catalog.index.vocabulary)
+    for token in sorted(set(vocabulary) - set(expected)):
+        mismatches.append({'token': token, 'expected': [], 'actual': catalog.index._postings(vocabulary.index(token)).tolist()})
+    for position, token in enumerate(vocabulary):
+        rows = catalog.index._postings(position).tolist()
+        if token in expected and rows != sorted(expected[token]):
+            mismatches.append({'token': token, 'expected': sorted(expected[token]), 'actual': rows})
+    for token in sorted(set(expected) - set(vocabulary)):
+        mismatches.append({'token': token, 'expected': sorted(expected[token]), 'actual': []})
+    return mismatches
+
+
+def boundary_check_analyses():
+    return [
+        {'topics': topics, 'keywords': keywords, 'language_preference': language, 'duration_max': duration}
+        for topics, keywords in [([term], []) for term in BOUNDARY_CHECK_TERMS] + [([], [term]) for term in BOUNDARY_CHECK_TERMS] + [([], [])]
+        for language in ('hebrew', 'english', None)
+        for duration in (None, 30)
+    ]
+
+
+if __name__ == '__main__':
+    # שימוש: python local_catalog.py [podcast_dataset.csv] - בדיקת האינדקס וזהות הציונים (שורות הגבול + הדטהסט אם ניתן)
+    import sys
+    import pandas as pd
+
+    frames = [pd.DataFrame(BOUNDARY_CHECK_ROWS)]
+    if len(sys.argv) > 1:
+        frames.append(pd.read_csv(sys.argv[1]))
+    failures = []
+    for frame in frames:
+        failures += check_index(frame)
+        failures += check_scores(frame, boundary_check_analyses())
+    for failure in failures[:20]:
+        print(failure)
+    if failures:
+        raise SystemExit(f"❌ {len(failures)} אי-התאמות מול האינדקס / החישוב השורתי")
+    print("✅ האינדקס והציונים זהים לחישוב לפי שדות")
@@ -0,0 +1,81 @@
+import json
+import os
+from collections import deque
+from functools import lru_cache
+
+# טבלאות הביטויים (קטגוריה -> רשימת ביטויים) - נטענות פעם אחת בטעינת המודול
+PHRASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'phrases.json')
+MATCH_CACHE_SIZE = 1024  # כמה הודעות אחרונות זוכרים, כדי שכל הבדיקות על אותה הודעה יסרקו אותה פעם אחת
+
+
+class PhraseMatcher:
+    """אוטומט Aho-Corasick על כל טבלאות הביטויים: מעבר אחד על ההודעה מוצא את כל הביטויים מכל הקטגוריות.
+
+    ההתאמה היא של תת-מחרוזת, בדיוק כמו `phrase in text`"""
+
+    def __init__(self, tables):
+        self.tables = {category: [phrase.lower() for phrase in phrases] for category, phrases in tables.items()}
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for category, phrases in self.tables.items():
+            for order, phrase in enumerate(phrases):
+                node = 0
+                for char in phrase:
+                    child = self._goto[node].get(char)
+                    if child is None:
+                        child = len(self._goto)
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._output.append([])
+                        self._goto[node][char] = child
+                    node = child
+                if node:
+                    self._output[node].append((category, order, phrase))
+
+        # קישורי כישלון ב-BFS; כל צומת יורש גם את הביטויים שמסתיימים בסיפא שלו
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        self.match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._scan)
+
+    def _scan(self, text):
+        """מחזיר מילון קטגוריה -> הביטויים שנמצאו (לפי סדרם בטבלה); קטגוריה בלי התאמות לא מופיעה"""
+        found = {}
+        node = 0
+        for char in text.lower():
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for category, order, phrase in self._output[node]:
+                found.setdefault(category, {}).setdefault(order, phrase)
+        return {category: tuple(phrases[order] for order in sorted(phrases)) for category, phrases in found.items()}
+
+    def categories(self, prefix):
+        """שמות הקטגוריות שמתחילות בקידומת (בלי הקידומת), לפי סדרן בקובץ: 'topic:' -> ספורט, טכנולוגיה..."""
+        return [category[len(prefix):] for category in self.tables if category.startswith(prefix)]
+
+    @classmethod
+    def from_file(cls, path=PHRASES_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+
+_phrase_matcher = None
+
+
+def get_phrase_matcher():
+    """המאתר המשותף לתהליך"""
+    global _phrase_matcher
+    if _phrase_matcher is None:
+        _phrase_matcher = PhraseMatcher.from_file()
+    return _phrase_matcher
@@ -0,0 +1,213 @@
+import math
+import re
+import sys
+import weakref
+
+DESCRIPTION_PREVIEW = 200  # אורך התיאור שנשמר לתוכניות מ-Spotify (וגם מוצג למשתמש)
+
+# tuple אחד לכל צירוף שפות ('he',) / ('en', 'en-US') - משותף לכל התוכניות
+_language_tuples = {}
+
+
+def intern_languages(languages):
+    """קודי שפה כ-tuple משותף של מחרוזות interned"""
+    key = tuple(sys.intern(str(language)) for language in languages or () if language)
+    return _language_tuples.setdefault(key, key)
+
+
+def preview(text, length=DESCRIPTION_PREVIEW):
+    return text[:length] + "..." if len(text) > length else text
+
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize_name(name):
+    """שם להשוואה: lowercase, בלי סימני פיסוק ורווחים כפולים"""
+    return ' '.join(_WORD_PATTERN.findall(str(name).lower()))
+
+
+def spotify_show_id(url):
+    """מזהה התוכנית מקישור Spotify (open.spotify.com/show/<id>), או None"""
+    if url and 'spotify.com/show/' in url:
+        return url.rsplit('/show/', 1)[1].split('?')[0].strip('/') or None
+    return None
+
+
+def podcast_key(url, name):
+    """מזהה יציב לתוכנית: מזהה Spotify, אחרת הקישור, ואם אין - השם המנורמל"""
+    show_id = spotify_show_id(url)
+    if show_id:
+        return 'spotify:' + show_id
+    if url and url != '#':
+        return url
+    return 'name:' + normalize_name(name)
+
+
+class Podcast:
+    """נתוני תוכנית - רשומה קומפקטית אחת לכל תוכנית, משותפת לכל המשתמשים והבקשות (דרך PodcastStore)"""
+
+    __slots__ = ('key', 'name', 'publisher', 'description', 'url', 'duration_minutes', 'languages', 'total_episodes',
+                 '__weakref__')
+    FIELDS = ('name', 'publisher', 'description', 'url', 'duration_minutes', 'languages', 'total_episodes')
+    # ערכים שנחשבים חסרים כשממזגים שני עותקים של אותה תוכנית
+    MISSING = (None, '', (), 0, 'Unknown', '#', 'nan')
+
+    def __init__(self, name, publisher='Unknown', description='', url='#', duration_minutes=None, languages=(),
+                 total_episodes=0):
+        self.name = name
+        self.publisher = publisher
+        self.description = description
+        self.url = url
+        self.duration_minutes = duration_minutes
+        self.languages = intern_languages(languages)
+        self.total_episodes = total_episodes
+        self.key = podcast_key(url, name)
+
+    @classmethod
+    def from_spotify(cls, show, duration_minutes=None, description_length=DESCRIPTION_PREVIEW):
+        """רשומה מתוכנית בתשובת החיפוש של Spotify (description_length=None - התיאור המלא)"""
+        description = show['description']
+        return cls(
+            name=show['name'],
+            publisher=show['publisher'],
+            description=description if description_length is None else preview(description, description_length),
+            url=show['external_urls']['spotify'],
+            duration_minutes=duration_minutes,
+            languages=show.get('languages', []),
+            total_episodes=show.get('total_episodes', 0)
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """רשומה משורה בדטהסט המקומי (ערכי numpy -> Python, NaN -> None)"""
+        def plain(value, default=None):
+            value = value.item() if hasattr(value, 'item') else value
+            return default if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+        language = plain(row.get('language'))
+        return cls(
+            name=plain(row.get('name'), 'Unknown'),
+            publisher=plain(row.get('publisher'), 'Unknown'),
+            description=str(row.get('description', '')),
+            url=plain(row.get('url'), '#'),
+            duration_minutes=plain(row.get('duration_minutes')),
+            languages=[language] if language is not None else [],
+            total_episodes=plain(row.get('total_episodes'), 0)
+        )
+
+    @property
+    def show_id(self):
+        return spotify_show_id(self.url)
+
+    def fill_missing(self, other):
+        """השלמת שדות חסרים מעותק אחר של אותה תוכנית (למשל משך מהדטהסט כש-Spotify לא החזיר)"""
+        for field in ('publisher', 'description', 'duration_minutes', 'languages', 'total_episodes'):
+            if getattr(self, field) in self.MISSING and getattr(other, field) not in self.MISSING:
+                setattr(self, field, getattr(other, field))
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data['languages'] = list(self.languages)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def __repr__(self):
+        return f'Podcast({self.name!r}, {self.url!r})'
+
+
+class Recommendation:
+    """תוכנית כמועמדת בחיפוש מסוים: הרשומה המשותפת + מקור וציון הדמיון לבקשה.
+    שדות התוכנית נקראים ישירות (rec.name, rec.languages...)"""
+
+    __slots__ = ('podcast', 'source', 'similarity_score')
+
+    def __init__(self, podcast, source, similarity_score=0.0):
+        self.podcast = podcast
+        self.source = source
+        self.similarity_score = similarity_score
+
+    def __getattr__(self, name):
+        # נקרא רק לשדות שאינם של ההמלצה עצמה
+        if name == 'podcast' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.podcast, name)
+
+    def __repr__(self):
+        return f'Recommendation({self.podcast!r}, {self.source!r}, {self.similarity_score!r})'
+
+
+class PodcastStore:
+    """רשומה אחת לכל תוכנית (לפי key) כל עוד מישהו מחזיק בה - תוכניות שאף אחד לא מחזיק משתחררות"""
+
+    def __init__(self):
+        self._podcasts = weakref.WeakValueDictionary()
+
+    def add(self, podcast):
+        """מחזיר את הרשומה הקיימת לתוכנית (משלים בה שדות חסרים), או שומר את החדשה"""
+        existing = self._podcasts.get(podcast.key)
+        if existing is None:
+            self._podcasts[podcast.key] = podcast
+            return podcast
+        existing.fill_missing(podcast)
+        return existing
+
+    def __len__(self):
+        return len(self._podcasts)
+
+
+def _merge_pair(kept, item):
+    """איחוד שני עותקים: הציון והמקור של הטוב מביניהם, הרשומה עם מזהה Spotify (משולמת מהשנייה)"""
+    first = getattr(kept, 'podcast', kept)
+    second = getattr(item, 'podcast', item)
+    base, extra = (second, first) if first.show_id is None and second.show_id is not None else (first, second)
+    if base is not extra:
+        base.fill_missing(extra)
+
+    if not isinstance(kept, Recommendation):
+        return base
+    best = item if item.similarity_score > kept.similarity_score else kept
+    return best if best.podcast is base else Recommendation(base, best.source, best.similarity_score)
+
+
+def merge_duplicates(items):
+    """הסרת כפילויות במעבר אחד (Podcast או Recommendation), לפי סדר ההופעה הראשונה.
+
+    אותה תוכנית = אותו מזהה Spotify; לעותק בלי מזהה (שורה מקומית) - אותו שם מנורמל.
+    שתי תוכניות עם מזהים שונים לא מתאחדות גם אם השם זהה"""
+    merged = []
+    by_id = {}
+    by_name = {}
+    for item in items:
+        show_id = item.show_id
+        name = normalize_name(item.name)
+        position = by_id.get(show_id) if show_id else None
+        if position is None and name in by_name:
+            candidate = by_name[name]
+            if show_id is None or merged[candidate].show_id is None:
+                position = candidate
+
+        if position is None:
+            position = len(merged)
+            merged.append(item)
+        else:
+            merged[position] = _merge_pair(merged[position], item)
+
+        if show_id:
+            by_id.setdefault(show_id, position)
+        by_name.setdefault(name, position)
+    return merged
+
+
+_podcast_store = None
+
+
+def get_podcast_store():
+    """מאגר הרשומות המשותף לתהליך"""
+    global _podcast_store
+    if _podcast_store is None:
+        _podcast_store = PodcastStore()
+    return _podcast_store
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from podcast import Podcast, Recommendation, get_podcast_store, merge_duplicates
+from spotify_api import PRIORITY_BACKGROUND, RequestPriority
+from storage import SQLiteStore
+
+# מאגרי מועמדים מחושבים מראש לנושאים הנפוצים: לכל (נושא, שפה, משך) רשימה מדורגת מ-Spotify ומהדטהסט המקומי,
+# שנבנית ברקע ונשמרת בדיסק. בקשה שמכוסה במאגרים עוברת רק דירוג אישי של המועמדים שבהם
+RECOMMENDATION_POOLS = True
+POOLS_PATH = 'recommendation_pools.sqlite3'
+POOL_LANGUAGES = ('hebrew', 'english')
+POOL_DURATION_BUCKETS = (15, 30, 60, None)  # גבול עליון בדקות; None - בלי הגבלת משך
+POOL_SIZE = 60  # מועמדים בכל מאגר
+POOL_REFRESH_INTERVAL = 6 * 3600  # שניות - מאגר ישן מזה נבנה מחדש
+POOL_MAX_AGE = 24 * 3600  # מאגר ישן מזה לא מוגש (הבקשה עוברת לחיפוש הרגיל)
+POOL_CHECK_INTERVAL = 10 * 60  # כל כמה שניות בודקים אילו מאגרים צריך לבנות (או לטעון מהדיסק)
+POOL_BUILD_PAUSE = 1  # שניות בין מאגר למאגר - הבנייה לא תופסת את כל קצב הבקשות ל-Spotify
+
+
+def duration_bucket(duration_max, buckets=POOL_DURATION_BUCKETS):
+    """המאגר שמכסה הגבלת משך: הגבול הקטן ביותר שלא קטן ממנה (None - בלי הגבלה, או שאף גבול לא מכסה אותה)"""
+    if not duration_max:
+        return None
+    return min((bucket for bucket in buckets if bucket is not None and bucket >= duration_max), default=None)
+
+
+def pool_key(topic, language, bucket):
+    return f"{topic}|{language}|{bucket or 'any'}"
+
+
+class RecommendationPools:
+    """המאגרים בזיכרון (נטענים מהדיסק ברקע אחרי העלייה) והבנייה שלהם ברקע.
+
+    build(analysis) מחזיר את המועמדים לניתוח הקנוני של המאגר (נושא אחד, בלי מילות מפתח);
+    הבנייה רצה בעדיפות רקע, כך שבקשות של משתמשים יוצאות ל-Spotify לפניה.
+    כל הגישה ל-SQLite (פתיחה, קריאה, כתיבה) רצה ב-thread - לא חוסמת את הלולאה"""
+
+    def __init__(self, topics, path=POOLS_PATH, languages=POOL_LANGUAGES, buckets=POOL_DURATION_BUCKETS,
+                 size=POOL_SIZE, refresh_interval=POOL_REFRESH_INTERVAL, max_age=POOL_MAX_AGE, podcasts=None):
+        self.topics = list(topics)
+        self.languages = languages
+        self.buckets = buckets
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.podcasts = podcasts if podcasts is not None else get_podcast_store()
+        self.path = path
+        self.store = None  # נפתח בגישה הראשונה (ב-thread)
+        self._pools = {}  # key -> (זמן הבנייה, [Recommendation] מדורג)
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.failures = 0
+
+    def combinations(self):
+        """(מפתח, ניתוח קנוני) לכל מאגר"""
+        for topic in self.topics:
+            for language in self.languages:
+                for bucket in self.buckets:
+                    yield pool_key(topic, language, bucket), {
+                        'topics': [topic],
+                        'keywords': [],
+                        'language_preference': language,
+                        'duration_max': bucket,
+                    }
+
+    def _open(self):
+        if self.store is None:
+            self.store = SQLiteStore(self.path, table='pools', max_entries=0)
+        return self.store
+
+    def _read(self, keys):
+        return self._open().get_many(keys)
+
+    def _write(self, key, entries):
+        self._open().set(key, entries)
+
+    async def load(self):
+        """טעינת המאגרים מהדיסק (גם כאלה שתהליך אחר בנה); הקריאה ב-thread, הפענוח בלולאה"""
+        keys = [key for key, _ in self.combinations()]
+        stored = await asyncio.to_thread(self._read, keys)
+        for key, (entries, built_at) in stored.items():
+            current = self._pools.get(key)
+            if current is None or current[0] < built_at:
+                self._pools[key] = (built_at, self._decode(entries))
+        return len(self._pools)
+
+    def _decode(self, entries):
+        return [Recommendation(self.podcasts.add(Podcast.from_dict(show)), source, score)
+                for show, source, score in entries]
+
+    def lookup(self, analysis):
+        """המועמדים מהמאגרים של הבקשה (כל הנושאים שלה), או None אם היא לא מכוסה במלואה במאגרים עדכניים"""
+        topics = analysis.get('topics') or []
+        language = analysis.get('language_preference')
+        duration_max = analysis.get('duration_max')
+        bucket = duration_bucket(duration_max, self.buckets)
+        if duration_max and bucket is None:
+            # הגבלה מעבר לגבול הגדול ביותר: במאגר שבלי הגבלה המשכים לא נפתרו, ואי אפשר לסנן לפיהם
+            self.misses += 1
+            return None
+        now = time.time()
+
+        candidates = []
+        for topic in topics:
+            entry = self._pools.get(pool_key(topic, language, bucket))
+            if entry is None or now - entry[0] >= self.max_age:
+                self.misses += 1
+                return None
+            candidates.extend(entry[1])
+        if not topics:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return candidates
+
+    async def refresh(self, build):
+        """בנייה מחדש של המאגרים שהגיע זמנם (אחרי טעינה של מה שכבר בדיסק); מחזיר כמה נבנו"""
+        await self.load()
+        built = 0
+        for key, analysis in self.combinations():
+            entry = self._pools.get(key)
+            if entry is not None and time.time() - entry[0] < self.refresh_interval:
+                continue
+            try:
+                # משימות שנוצרות בתוך build יורשות את העדיפות
+                with RequestPriority(PRIORITY_BACKGROUND):
+                    candidates = await build(analysis)
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ שגיאה בבניית המאגר {key}: {e}")
+                continue
+
+            ranked = merge_duplicates(candidates)
+            ranked.sort(key=lambda rec: rec.similarity_score, reverse=True)
+            ranked = ranked[:self.size]
+            if not ranked:
+                # לא דורסים מאגר קיים בתוצאה ריקה (למשל Spotify לא זמין)
+                self.failures += 1
+                continue
+            entries = [[rec.podcast.to_dict(), rec.source, rec.similarity_score] for rec in ranked]
+            await asyncio.to_thread(self._write, key, entries)
+            self._pools[key] = (time.time(), ranked)
+            self.builds += 1
+            built += 1
+            await asyncio.sleep(POOL_BUILD_PAUSE)
+        if built:
+            print(f"🏊 נבנו {built} מאגרי המלצות")
+        return built
+
+    async def _run(self, build, interval):
+        while True:
+            try:
+                if build is None:
+                    await self.load()
+                else:
+                    await self.refresh(build)
+            except Exception as e:
+                print(f"❌ שגיאה ברענון מאגרי ההמלצות: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, build=None, interval=POOL_CHECK_INTERVAL):
+        """רענון תקופתי בלולאה הנוכחית. build=None - רק טעינה מהדיסק של מאגרים שתהליך אחר בונה"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(build, interval))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {'pools': len(self._pools), 'hits': self.hits, 'misses': self.misses,
+                'builds': self.builds, 'failures': self.failures}
+
+    def close(self):
+        self.stop()
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,156 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from binary_catalog import CATALOG_DIR, load_catalog
+
+# חישובי הדמיון (SequenceMatcher) הם עבודת CPU טהורה - אצוות גדולות נשלחות לתהליכים אחרים
+SCORING_POOL_SIZE = max((os.cpu_count() or 1) - 1, 0)  # 0 - בלי pool, הכל בתהליך הראשי
+SCORING_CHUNK_SIZE = 64  # מועמדים בכל משימה שנשלחת לתהליך
+SCORING_POOL_THRESHOLD = 128  # אצווה קטנה מזה מדורגת בתהליך עצמו (ההעברה לתהליך אחר יקרה יותר)
+
+# בתהליכי ה-pool: הקטלוג הממופה, נטען פעם אחת ב-initializer (ומחדש רק כשהגרסה מתחלפת),
+# ומנוע הדמיון הווקטורי המאומן של הקטלוג בתהליך הראשי (מגיע ב-initializer)
+_catalog = None
+_catalog_dir = None
+_similarity = None
+
+
+def _init_worker(catalog_dir, similarity=None):
+    global _catalog, _catalog_dir, _similarity
+    _catalog_dir = catalog_dir
+    _catalog = load_catalog(catalog_dir)
+    _similarity = similarity
+
+
+def _exact_chunk(generation, rows, query, direct, metadata):
+    global _catalog
+    if _catalog is None or _catalog.generation != generation:
+        _catalog = load_catalog(_catalog_dir, generation=generation)
+        if _catalog is None:
+            raise LookupError(f"catalog generation {generation} is not available")
+    return _catalog.exact_scores(rows, query, direct, metadata)
+
+
+def _score_chunk(function, analysis, podcasts, similarity=None):
+    """similarity=None בתהליך pool - המנוע המאומן שהגיע ב-initializer"""
+    similarity = similarity or _similarity
+    return [function(analysis, podcast, similarity) for podcast in podcasts]
+
+
+class ScoringPool:
+    """pool תהליכים לחישוב ציוני דמיון: מועמדים מ-Spotify (SimilarityScorer) וציונים מדויקים בקטלוג המקומי.
+
+    כל תהליך טוען מראש את הקטלוג הבינארי (mmap) - לשורות שולחים רק מספרים, לא את הטקסט.
+    הציונים זהים לחישוב בתהליך; אם ה-pool לא זמין, מחשבים בתהליך עצמו"""
+
+    def __init__(self, size=SCORING_POOL_SIZE, chunk_size=SCORING_CHUNK_SIZE, threshold=SCORING_POOL_THRESHOLD,
+                 catalog_dir=CATALOG_DIR):
+        self.size = size
+        self.chunk_size = chunk_size
+        self.threshold = threshold
+        self.catalog_dir = catalog_dir
+        self._executor = None
+        self._similarity = None  # המנוע הווקטורי שהתהליכים הנוכחיים קיבלו
+        # exact_scores נקרא מכמה threads של חיפוש מקומי - יצירה והחלפה של ה-executor תחת נעילה
+        self._lock = threading.Lock()
+        self.pooled_batches = 0
+        self.local_batches = 0
+
+    @property
+    def batch_size(self):
+        """גודל אצווה שנותן משימה לכל אחד מהתהליכים"""
+        return self.size * self.chunk_size
+
+    def _pool(self, similarity=None):
+        with self._lock:
+            # מנוע וקטורי אחר (קטלוג שנטען מחדש) - התהליכים עולים מחדש עם ה-IDF החדש.
+            # משימות שכבר נשלחו ל-executor הישן מסתיימות; שליחה חדשה אליו נכשלת ב-RuntimeError ועוברת לחישוב בתהליך
+            if self._executor is not None and similarity is not None and similarity is not self._similarity:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            # התהליכים עולים רק באצווה הגדולה הראשונה; spawn - בתהליך הראשי כבר רצים threads
+            if self._executor is None:
+                self._similarity = similarity
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker, initargs=(self.catalog_dir, similarity)
+                )
+            return self._executor
+
+    def _use_pool(self, count):
+        use = self.size > 0 and count >= self.threshold
+        if use:
+            self.pooled_batches += 1
+        else:
+            self.local_batches += 1
+        return use
+
+    def _chunks(self, count):
+        return [(start, start + self.chunk_size) for start in range(0, count, self.chunk_size)]
+
+    def _broken(self, error, executor):
+        print(f"⚠️ Scoring pool unavailable ({error}) - scoring in-process")
+        if isinstance(error, BrokenExecutor):
+            with self._lock:
+                # רק אם בינתיים לא הוחלף ב-executor חדש
+                if self._executor is executor:
+                    self._executor = None
+
+    def exact_scores(self, catalog, rows, query, direct, metadata):
+        """catalog.exact_scores בתהליכי ה-pool (חוסם - נקרא מה-thread של החיפוש המקומי).
+        רק לקטלוג בינארי: התהליכים טוענים את אותה גרסה מהדיסק"""
+        if catalog.generation is None or not self._use_pool(len(rows)):
+            return catalog.exact_scores(rows, query, direct, metadata)
+        executor = self._pool()
+        try:
+            futures = [
+                executor.submit(_exact_chunk, catalog.generation, rows[start:end], query,
+                                direct[start:end], metadata[start:end])
+                for start, end in self._chunks(len(rows))
+            ]
+            return [score for future in futures for score in future.result()]
+        except (BrokenExecutor, RuntimeError, LookupError) as e:
+            # RuntimeError - ה-executor הוחלף (נסגר) בין קבלתו לשליחה
+            self._broken(e, executor)
+            return catalog.exact_scores(rows, query, direct, metadata)
+
+    async def score_podcasts(self, function, analysis, podcasts, similarity=None):
+        """function(analysis, podcast, similarity) לכל מועמד; אצווה גדולה נשלחת ל-pool בלי לחסום את לולאת האירועים.
+        מנוע וקטורי מאומן מגיע לתהליכים פעם אחת (initializer) ולא עם כל משימה"""
+        if not self._use_pool(len(podcasts)):
+            return _score_chunk(function, analysis, podcasts, similarity)
+        vectorized = similarity is not None and similarity.vectorized
+        shared, sent = (similarity, None) if vectorized else (None, similarity)
+        loop = asyncio.get_running_loop()
+        executor = self._pool(shared)
+        try:
+            chunks = await asyncio.gather(*(
+                loop.run_in_executor(executor, _score_chunk, function, analysis, podcasts[start:end], sent)
+                for start, end in self._chunks(len(podcasts))
+            ))
+        except (BrokenExecutor, RuntimeError) as e:
+            self._broken(e, executor)
+            return _score_chunk(function, analysis, podcasts, similarity)
+        return [score for chunk in chunks for score in chunk]
+
+    def stats(self):
+        return {'size': self.size, 'pooled_batches': self.pooled_batches, 'local_batches': self.local_batches}
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_scoring_pool = None
+
+
+def get_scoring_pool(size=None):
+    """ה-pool המשותף לתהליך (size קובע רק בקריאה הראשונה)"""
+    global _scoring_pool
+    if _scoring_pool is None:
+        _scoring_pool = ScoringPool(SCORING_POOL_SIZE if size is None else size)
+    return _scoring_pool
@@ -0,0 +1,426 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from podcast import Podcast, Recommendation, get_podcast_store
+from storage import SQLiteStore
+
+# מצב משתמשים (היסטוריה, המלצות שהוצגו, רשימת המועמדים) - איפה נשמר ולכמה זמן
+SESSION_BACKEND = 'memory'  # 'memory' / 'sqlite' / 'redis'
+SESSION_IDLE_TTL = 6 * 3600  # שניות בלי הודעה עד שהמצב של המשתמש נמחק
+SESSION_MAX_USERS = 10000
+SESSION_MEMORY_BUDGET = 64 * 1024 * 1024  # בתים (מוערכים לפי JSON) למצב בזיכרון
+SESSION_DB_PATH = 'sessions.sqlite3'
+SHOW_TABLE_MAX_SHOWS = 50000  # טבלת התוכניות המשותפת שרשימות המועמדים מצביעות אליה
+REDIS_URL = 'redis://localhost:6379/0'
+
+
+def _plain(value):
+    """ערכי numpy (מהדטהסט המקומי) -> טיפוסי Python שאפשר לשמור כ-JSON"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _json_size(value):
+    return len(json.dumps(value, ensure_ascii=False, default=lambda o: o.to_dict() if hasattr(o, 'to_dict') else str(o)))
+
+
+class MemoryBackend:
+    """מאגר בתהליך: פינוי לפי זמן חוסר פעילות, LRU לפי מספר רשומות ותקציב זיכרון בבתים"""
+
+    keeps_objects = True  # הערכים נשמרים כמו שהם (רשומות Podcast) ולא כ-JSON
+    remote = False  # בזיכרון התהליך - גישה ישירה, בלי טעינה מראש
+
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL, max_entries=SESSION_MAX_USERS, memory_budget=SESSION_MEMORY_BUDGET):
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()  # key -> (value, size, touched_at)
+        self.size = 0
+        self.evictions = 0
+
+    def get_many(self, keys):
+        now = time.time()
+        found = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            value, size, touched_at = entry
+            if now - touched_at >= self.idle_ttl:
+                self._remove(key)
+                continue
+            self._entries[key] = (value, size, now)
+            self._entries.move_to_end(key)
+            found[key] = value
+        return found
+
+    def set_many(self, items):
+        now = time.time()
+        for key, value in items.items():
+            self._remove(key)
+            size = _json_size(value)
+            self._entries[key] = (value, size, now)
+            self.size += size
+        self._evict(now)
+
+    def delete(self, key):
+        self._remove(key)
+
+    def grow(self, key, added):
+        """ערך ששונה במקום (הוספה לרשימה) - רק עדכון הגודל וזמן הגישה, בלי לקודד אותו מחדש"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        now = time.time()
+        self._entries[key] = (entry[0], entry[1] + added, now)
+        self._entries.move_to_end(key)
+        self.size += added
+        self._evict(now)
+        return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def _evict(self, now):
+        # הרשומות ממוינות לפי זמן גישה - מפנים מההתחלה עד שחוזרים לתקציב
+        while self._entries:
+            key, (_, size, touched_at) = next(iter(self._entries.items()))
+            if (now - touched_at < self.idle_ttl and len(self._entries) <= self.max_entries
+                    and self.size <= self.memory_budget):
+                break
+            self._remove(key)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteSessionBackend:
+    """מאגר על SQLite - שורד הפעלה מחדש ומשותף לכמה תהליכים על אותו קובץ.
+    המתודות חוסמות - SessionStore מריץ אותן ב-thread"""
+
+    keeps_objects = False
+    remote = True
+
+    async def call(self, method, *args):
+        return await asyncio.to_thread(getattr(self, method), *args)
+
+    def __init__(self, path=SESSION_DB_PATH, table='sessions', idle_ttl=SESSION_IDLE_TTL, max_entries=SESSION_MAX_USERS):
+        self.idle_ttl = idle_ttl
+        self.store = SQLiteStore(path, table=table, max_entries=max_entries)
+
+    def get_many(self, keys):
+        now = time.time()
+        found = {}
+        for key, (value, updated_at) in self.store.get_many(keys).items():
+            if now - updated_at >= self.idle_ttl:
+                self.store.delete(key)
+            else:
+                found[key] = value
+        return found
+
+    def set_many(self, items):
+        self.store.set_many(items)
+
+    def delete(self, key):
+        self.store.delete(key)
+
+    def __len__(self):
+        return len(self.store)
+
+
+class RedisSessionBackend:
+    """מאגר על שרת תואם Redis (Redis / KeyDB / Valkey). התוקף מתחדש בכל כתיבה;
+    תקציב הזיכרון נאכף בשרת (maxmemory + allkeys-lru). לקוח אסינכרוני - לא חוסם את הלולאה"""
+
+    keeps_objects = False
+    remote = True
+
+    def __init__(self, url=REDIS_URL, prefix='shmali:session:', idle_ttl=SESSION_IDLE_TTL):
+        import redis.asyncio as redis  # תלות אופציונלית - רק למי שבוחר בשרת משותף
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.idle_ttl = idle_ttl
+
+    async def call(self, method, *args):
+        return await getattr(self, method)(*args)
+
+    async def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.client.mget([self.prefix + key for key in keys])
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, items):
+        pipeline = self.client.pipeline()
+        for key, value in items.items():
+            pipeline.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=self.idle_ttl)
+        await pipeline.execute()
+
+    async def delete(self, key):
+        await self.client.delete(self.prefix + key)
+
+    async def count(self):
+        return len([key async for key in self.client.scan_iter(self.prefix + '*')])
+
+
+class ShownKeys(list):
+    """המזהים שכבר הוצגו, לפי הסדר (כך הם נשמרים), עם set לבדיקת 'כבר הוצג' ב-O(1)"""
+
+    def __init__(self, keys=()):
+        super().__init__(keys)
+        self.keys = set(self)
+
+    def add(self, key):
+        self.append(key)
+        self.keys.add(key)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+
+class _OpenSession:
+    """עותק העבודה של משתמש שיש לו טיפול פעיל: המצב, התוכניות שהמועמדים שלו מצביעים אליהן,
+    ומה שעוד לא נשמר במאגר"""
+
+    __slots__ = ('session', 'shows', 'pending_shows', 'holders', 'dirty')
+
+    def __init__(self, session, shows):
+        self.session = session
+        self.shows = shows
+        self.pending_shows = {}
+        self.holders = 0
+        self.dirty = False
+
+
+class SessionStore:
+    """מצב השיחה של כל משתמש ברשומה אחת. רשימת המועמדים נשמרת כמזהים (עם ציון ומקור)
+    שמצביעים לטבלת תוכניות משותפת, כך שתוכנית שמופיעה אצל הרבה משתמשים נשמרת פעם אחת.
+
+    במאגר חיצוני (SQLite / Redis) הגישה היא בתוך session(user_id): המצב נטען פעם אחת בלי לחסום את הלולאה,
+    הקריאות והשינויים באמצע הטיפול הם בזיכרון, והשמירה נעשית ביציאה. מאגר בזיכרון נגיש ישירות"""
+
+    def __init__(self, sessions=None, shows=None, podcasts=None):
+        # בודקים מול None - מאגר ריק הוא falsy (__len__)
+        self.sessions = sessions if sessions is not None else MemoryBackend()
+        self.shows = shows if shows is not None else MemoryBackend(max_entries=SHOW_TABLE_MAX_SHOWS)
+        self.podcasts = podcasts if podcasts is not None else get_podcast_store()
+        self.remote = self.sessions.remote or self.shows.remote
+        self._open = {}  # user_id -> _OpenSession
+
+    @asynccontextmanager
+    async def session(self, user_id):
+        """טעינת המצב של המשתמש לפני הטיפול ושמירתו בסוף. כמה טיפולים במקביל לאותו משתמש חולקים עותק אחד"""
+        if not self.remote:
+            yield
+            return
+        key = str(user_id)
+        entry = self._open.get(key)
+        if entry is None:
+            session = (await self.sessions.call('get_many', [key])).get(key, {})
+            # התוכניות של רשימת המועמדים נטענות יחד עם המצב - הפענוח באמצע הטיפול לא ניגש למאגר
+            show_keys = [candidate[0] for candidate in session.get('candidates', [])]
+            shows = await self.shows.call('get_many', show_keys) if show_keys else {}
+            # טיפול אחר אולי פתח את המשתמש בזמן הטעינה
+            entry = self._open.setdefault(key, _OpenSession(session, shows))
+        entry.holders += 1
+        try:
+            yield
+        finally:
+            entry.holders -= 1
+            await self._flush(key, entry)
+            if entry.holders == 0 and self._open.get(key) is entry:
+                del self._open[key]
+
+    async def _flush(self, key, entry):
+        if entry.pending_shows:
+            shows, entry.pending_shows = entry.pending_shows, {}
+            await self.shows.call('set_many', shows)
+        if entry.dirty:
+            entry.dirty = False
+            if entry.session:
+                # עותק - הטיפול יכול להמשיך לשנות את המצב בזמן שהכתיבה רצה ב-thread
+                await self.sessions.call('set_many', {key: dict(entry.session)})
+            else:
+                await self.sessions.call('delete', key)
+
+    def _entry(self, user_id):
+        entry = self._open.get(str(user_id))
+        if entry is None and self.remote:
+            raise RuntimeError(f"session {user_id} is not open - use 'async with store.session(user_id)'")
+        return entry
+
+    def load(self, user_id):
+        entry = self._entry(user_id)
+        if entry is not None:
+            return dict(entry.session)
+        return self.sessions.get_many([str(user_id)]).get(str(user_id), {})
+
+    def save(self, user_id, session):
+        entry = self._entry(user_id)
+        if entry is not None:
+            entry.session = session
+            entry.dirty = True
+        elif session:
+            self.sessions.set_many({str(user_id): session})
+        else:
+            self.sessions.delete(str(user_id))
+
+    def _live(self, user_id):
+        """המצב עצמו (לא עותק) לשינוי במקום, והאם הוא כבר שמור במאגר"""
+        entry = self._entry(user_id)
+        if entry is not None:
+            return entry.session, True
+        found = self.sessions.get_many([str(user_id)]).get(str(user_id))
+        return (found, True) if found is not None else ({}, False)
+
+    def shown(self, user_id):
+        """מה שכבר הוצג למשתמש. רשימה רגילה (אחרי השמה או טעינה מ-JSON) מומרת פעם אחת ומחליפה את עצמה במצב"""
+        session, _ = self._live(user_id)
+        shown = session.get('shown')
+        if not isinstance(shown, ShownKeys):
+            shown = ShownKeys(shown or [])
+            if session:
+                session['shown'] = shown  # אותו תוכן - אין מה לשמור
+        return shown
+
+    def mark_shown(self, user_id, key, cursor):
+        """הוספת מזהה למה שהוצג וקידום הסמן - הרשימה לא מועתקת ולא מקודדת מחדש"""
+        shown = self.shown(user_id)
+        session, stored = self._live(user_id)
+        added = _json_size(key) + 2  # כולל ', '
+        if 'shown' not in session:
+            added += _json_size('shown') + 4
+        session['shown'] = shown
+        shown.add(key)
+        added += _json_size(cursor) - _json_size(session.get('cursor', ''))
+        session['cursor'] = cursor
+        entry = self._entry(user_id)
+        if entry is not None:
+            entry.dirty = True
+        elif not stored or not self.sessions.grow(str(user_id), added):
+            self.save(user_id, session)
+
+    def update(self, user_id, **fields):
+        """עדכון כמה שדות בכתיבה אחת (הערכים נשמרים כמו שהם - מועמדים צריכים להיות כבר מקודדים)"""
+        session = self.load(user_id)
+        session.update(fields)
+        self.save(user_id, session)
+
+    def append_candidates(self, user_id, recommendations):
+        """הוספת מועמדים לסוף הרשימה של המשתמש בלי לפענח את הקיימים"""
+        session = self.load(user_id)
+        session['candidates'] = session.get('candidates', []) + self.encode_candidates(recommendations, user_id)
+        self.save(user_id, session)
+
+    def encode_candidates(self, recommendations, user_id=None):
+        """שמירת התוכניות בטבלה המשותפת והחזרת [מזהה, ציון, מקור] לכל מועמד
+        (במאגר חיצוני - נכתבות בסוף הטיפול של המשתמש)"""
+        shows = {}
+        entries = []
+        for rec in recommendations:
+            shows[rec.key] = rec.podcast if self.shows.keeps_objects else rec.podcast.to_dict()
+            entries.append([rec.key, _plain(rec.similarity_score), rec.source])
+        entry = self._entry(user_id) if self.remote else None
+        if entry is not None:
+            entry.shows.update(shows)
+            entry.pending_shows.update(shows)
+        else:
+            self.shows.set_many(shows)
+        return entries
+
+    def decode_candidates(self, entries, user_id=None):
+        """שחזור רשימת המועמדים; תוכנית שפונתה מהטבלה המשותפת פשוט מדולגת"""
+        if self.remote:
+            loaded = self._entry(user_id).shows
+            shows = {key: loaded[key] for key, _, _ in entries if key in loaded}
+        else:
+            shows = self.shows.get_many([key for key, _, _ in entries])
+        recommendations = []
+        for key, score, source in entries:
+            if key in shows:
+                show = shows[key]
+                podcast = show if isinstance(show, Podcast) else self.podcasts.add(Podcast.from_dict(show))
+                recommendations.append(Recommendation(podcast, source, score))
+        return recommendations
+
+    def view(self, field):
+        return SessionView(self, field)
+
+
+class SessionView:
+    """גישה בסגנון dict (user_id -> ערך) לשדה אחד במצב המשתמשים. כל השמה נכתבת למאגר,
+    ולכן שינוי ערך (append וכו') צריך להסתיים בהשמה מחדש"""
+
+    def __init__(self, store, field):
+        self.store = store
+        self.field = field
+
+    def _encode(self, user_id, value):
+        return self.store.encode_candidates(value, user_id) if self.field == 'candidates' else value
+
+    def _decode(self, user_id, value):
+        return self.store.decode_candidates(value, user_id) if self.field == 'candidates' else value
+
+    def __contains__(self, user_id):
+        return self.field in self.store.load(user_id)
+
+    def raw(self, user_id, default=None):
+        """הערך כפי שנשמר, בלי פענוח (למועמדים: [מזהה, ציון, מקור])"""
+        return self.store.load(user_id).get(self.field, default)
+
+    def get(self, user_id, default=None):
+        session = self.store.load(user_id)
+        return self._decode(user_id, session[self.field]) if self.field in session else default
+
+    def __getitem__(self, user_id):
+        session = self.store.load(user_id)
+        if self.field not in session:
+            raise KeyError(user_id)
+        return self._decode(user_id, session[self.field])
+
+    def __setitem__(self, user_id, value):
+        session = self.store.load(user_id)
+        session[self.field] = self._encode(user_id, value)
+        self.store.save(user_id, session)
+
+    def __delitem__(self, user_id):
+        session = self.store.load(user_id)
+        if self.field not in session:
+            raise KeyError(user_id)
+        del session[self.field]
+        self.store.save(user_id, session)
+
+    def pop(self, user_id, default=None):
+        try:
+            value = self[user_id]
+        except KeyError:
+            return default
+        del self[user_id]
+        return value
+
+
+_session_store = None
+
+
+def get_session_store(backend=None):
+    """מאגר המצב המשותף לתהליך, לפי SESSION_BACKEND"""
+    global _session_store
+    if _session_store is None:
+        backend = backend or SESSION_BACKEND
+        if backend == 'memory':
+            _session_store = SessionStore()
+        elif backend == 'sqlite':
+            _session_store = SessionStore(
+                SQLiteSessionBackend(),
+                SQLiteSessionBackend(table='session_shows', max_entries=SHOW_TABLE_MAX_SHOWS)
+            )
+        elif backend == 'redis':
+            _session_store = SessionStore(RedisSessionBackend(), RedisSessionBackend(prefix='shmali:show:'))
+        else:
+            raise ValueError(f"Unknown session backend: {backend}")
+    return _session_store
@@ -1,16 +1,35 @@
-import csv
-import random
-import requests
-import pandas as pd
-import base64
-import re
-import json
-from datetime import datetime, timedelta
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
-import openai
+from __future__ import annotations
+
+import time
+
+STARTUP_STARTED = time.perf_counter()  # נקודת האפס של מדידת העלייה - לפני כל שאר ה-imports
+
 import asyncio
-from difflib import SequenceMatcher
+import functools
+import json
+import os
+import re
+import threading
+from typing import TYPE_CHECKING
+from analysis_cache import LANGUAGE_WORDS, NUMBER_WORDS, STOPWORDS, get_analysis_cache
+from binary_catalog import CATALOG_DIR, MANIFEST_NAME, load_catalog, source_stamp, write_catalog
+from catalog_reloader import CATALOG_RELOAD, CatalogReloader
+from local_catalog import LOCAL_RESULTS_LIMIT, LocalCatalog, token_variants, tokenize
+from phrase_matcher import get_phrase_matcher
+from podcast import Podcast, Recommendation, get_podcast_store, merge_duplicates, preview
+from recommendation_pools import RECOMMENDATION_POOLS, RecommendationPools
+from scoring_pool import get_scoring_pool
+from session_store import get_session_store
+from spotify_api import (
+    RoundTripCounter, SpotifyError, get_client, get_search_cache, get_show_cache, get_token_manager,
+    resolve_episode_durations, search_shows
+)
+from text_similarity import get_similarity_backend
+
+# pandas, openai ו-telegram כבדים לטעינה - נטענים רק כשצריך אותם (ראו load_local_data, get_openai, main)
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
 
 # Configuration
 OPENAI_API_KEY = 'OPENAI_API_KEY'
@@ -18,44 +37,79 @@ TELEGRAM_TOKEN = "TELEGRAM_TOKEN"
 CLIENT_ID = 'CLIENT_ID'
 CLIENT_SECRET = 'CLIENT_SECRET'
 DATASET_CSV = 'podcast_dataset.csv'
+SEARCH_DEADLINE = 8  # שניות - מקור שלא חזר עד אז לא נכנס להמלצות
+POOL_BUILD_DEADLINE = 60  # שניות - בניית מאגר רצה בעדיפות רקע ויכולה לחכות בתור
+PROGRESSIVE_RESULTS = True  # לענות עם ההתאמה הטובה הראשונה ולהמשיך לדרג ברקע
+FIRST_RESULT_THRESHOLD = 0.55  # ציון מינימלי להתאמה שנשלחת לפני שכל המקורות חזרו
+SPOTIFY_RESULTS_LIMIT = 10  # תוצאות לכל וריאציית שאילתה הן פי 2 מזה - וזה גם גודל הצעד בדפדוף
+MAX_EXTRA_PAGES = 5  # כמה עמודים נוספים מ-Spotify מותר להביא כשהמועמדים של המשתמש נגמרים
+CATALOG_BACKGROUND_LOAD = True  # לטעון את הקטלוג המקומי ברקע - הבוט מקבל הודעות כבר בזמן הטעינה
+# מילים שהניתוח המקומי מבין חוץ מטבלאות הביטויים (נושאים, שפה, רמזי פודקאסט) - כל מילה אחרת בהודעה שולחת אותה ל-GPT
+LOCAL_ANALYSIS_WORDS = {'דקות', 'דקה', 'דק', 'שעה', 'שעות', 'עד', 'minute', 'minutes', 'min', 'hour', 'hours'}
+LOCAL_ANALYSIS_PHRASES = ('language_english', 'language_hebrew', 'strict_podcast_hint', 'fallback_podcast_hint')
+
+# קבלת עדכונים: 'polling' או 'webhook' (מאזין HTTP מקומי מאחורי reverse proxy שמטפל ב-TLS)
+BOT_MODE = 'polling'
+WEBHOOK_LISTEN = '127.0.0.1'
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = 'telegram'
+WEBHOOK_URL = 'https://WEBHOOK_HOST/telegram'  # הכתובת הציבורית שטלגרם שולח אליה (ה-proxy מעביר ל-WEBHOOK_PATH)
+WEBHOOK_SECRET = 'WEBHOOK_SECRET'  # נבדק בכל בקשה (X-Telegram-Bot-Api-Secret-Token)
+WORKER_PROCESSES = 1  # יותר מ-1: תהליך חזית שמנתב כל משתמש ל-worker קבוע (ראו workers.py)
+
+# זמני שלבי העלייה בשניות (imports, בניית הבוט, טעינת הקטלוג...)
+STARTUP_PHASES = {}
+
+
+def record_startup_phase(name, started):
+    STARTUP_PHASES[name] = round(time.perf_counter() - started, 3)
+    print(f"⏱️ Startup {name}: {STARTUP_PHASES[name]:.2f}s")
+
+
+_openai = None
+
 
-# Initialize OpenAI
-openai.api_key = OPENAI_API_KEY
+def get_openai():
+    """מודול openai (עם המפתח) - נטען רק בפעם הראשונה שצריך GPT; רוב הבקשות נענות בלי"""
+    global _openai
+    if _openai is None:
+        import openai
+        openai.api_key = OPENAI_API_KEY
+        _openai = openai
+    return _openai
 
 class SpotifyAPI:
-    def __init__(self, client_id, client_secret):
+    def __init__(self, client_id, client_secret, client=None, show_cache=None, search_cache=None, podcasts=None):
         self.client_id = client_id
         self.client_secret = client_secret
+        self.client = client or get_client()
+        self.show_cache = show_cache or get_show_cache()
+        self.search_cache = search_cache or get_search_cache()
+        self.podcasts = podcasts if podcasts is not None else get_podcast_store()
+        self.tokens = get_token_manager(client_id, client_secret)
         self.token = None
-        self.token_expiry = None
+        self.last_round_trips = 0
 
-    def get_access_token(self):
-        if self.token and self.token_expiry and datetime.now() < self.token_expiry:
-            return self.token
-        
+    async def get_access_token(self):
         try:
-            auth_str = f"{self.client_id}:{self.client_secret}"
-            b64_auth = base64.b64encode(auth_str.encode()).decode()
-            response = requests.post(
-                'https://accounts.spotify.com/api/token',
-                headers={'Authorization': f'Basic {b64_auth}'},
-                data={'grant_type': 'client_credentials'},
-                timeout=10
-            )
-            data = response.json()
-            self.token = data['access_token']
-            self.token_expiry = datetime.now() + timedelta(seconds=data.get('expires_in', 3600))
+            self.token = await self.tokens.get_token()
             return self.token
         except Exception as e:
             print(f"Error getting Spotify token: {e}")
             return None
 
-    def search_podcasts(self, query, max_duration=None, limit=10, language_preference=None):
-        """חיפוש פודקאסטים עם העדפת שפה"""
-        if not self.get_access_token():
+    async def search_podcasts(self, query, max_duration=None, limit=10, language_preference=None, offset=0):
+        """חיפוש פודקאסטים עם העדפת שפה (offset - לדפדוף לעמודי תוצאות הבאים)"""
+        with RoundTripCounter() as round_trips:
+            results = await self._search_podcasts(query, max_duration, limit, language_preference, offset)
+        
+        self.last_round_trips = round_trips.count
+        print(f"📡 Spotify round trips for '{query}': {round_trips.count}")
+        return results
+
+    async def _search_podcasts(self, query, max_duration, limit, language_preference, offset=0):
+        if not await self.get_access_token():
             return []
-            
-        headers = {'Authorization': f'Bearer {self.token}'}
         
         # בניית שאילתת חיפוש על בסיס העדפת השפה
         if language_preference == 'hebrew':
@@ -76,28 +130,20 @@ class SpotifyAPI:
         else:
             search_queries = [f'{query} podcast', f'{query} פודקאסט']
         
-        all_results = []
+        market = 'US' if language_preference == 'english' else 'IL'
+        
+        # סבב חיפוש - כל וריאציות השאילתה נשלחות במקביל
+        search_rounds = await asyncio.gather(
+            *(self._search_shows(search_query, limit * 2, market, offset) for search_query in search_queries),
+            return_exceptions=True
+        )
+        
+        candidates = []
         
-        for search_query in search_queries:
+        for shows in search_rounds:
             try:
-                market = 'US' if language_preference == 'english' else 'IL'
-                
-                response = requests.get(
-                    'https://api.spotify.com/v1/search',
-                    headers=headers,
-                    params={
-                        'q': search_query,
-                        'type': 'show',
-                        'limit': limit * 2,
-                        'market': market
-                    },
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    continue
-                    
-                shows = response.json().get('shows', {}).get('items', [])
+                if isinstance(shows, Exception):
+                    raise shows
                 
                 for show in shows:
                     # בדיקת שפה
@@ -126,171 +172,95 @@ class SpotifyAPI:
                             else:
                                 continue
                     
-                    # בדיקת משך אם נדרש
-                    duration_minutes = self.get_episode_duration(show['id'])
-                    if max_duration and duration_minutes and duration_minutes > max_duration:
-                        continue
-                    
-                    # הוספה לתוצאות אם לא קיים כבר
-                    if not any(r['name'] == show['name'] for r in all_results):
-                        all_results.append({
-                            'name': show['name'],
-                            'publisher': show['publisher'],
-                            'description': show['description'][:200] + "..." if len(show['description']) > 200 else show['description'],
-                            'url': show['external_urls']['spotify'],
-                            'duration_minutes': duration_minutes,
-                            'languages': languages,
-                            'total_episodes': show.get('total_episodes', 0)
-                        })
+                    candidates.append((show['id'], show))
                         
             except Exception as e:
                 print(f"Error searching Spotify: {e}")
                 continue
         
-        return all_results[:limit]
-
-    def get_episode_duration(self, show_id):
-        """קבלת משך הפרק האחרון"""
-        headers = {'Authorization': f'Bearer {self.token}'}
-        try:
-            response = requests.get(
-                f"https://api.spotify.com/v1/shows/{show_id}/episodes?limit=1",
-                headers=headers,
-                timeout=10
-            )
-            if response.status_code == 200:
-                items = response.json().get('items', [])
-                if items:
-                    duration_ms = items[0].get('duration_ms', 0)
-                    return round(duration_ms / 60000, 1) if duration_ms > 0 else None
-        except:
-            pass
-        return None
-
-class GPTAnalyzer:
-    def __init__(self):
-        self.conversation_history = {}
-    
-    async def check_podcast_relevance(self, user_text):
-        """בדיקה אם הבקשה רלוונטית לפודקאסטים - בדיקה ידנית קשיחה קודם"""
-        
-        # בדיקה ידנית קשיחה קודם כל
-        manual_check = self.strict_manual_check(user_text)
-        if manual_check["confidence"] > 0.8:
-            print(f"🔍 Manual strict check for '{user_text}': {manual_check}")
-            return manual_check
-        
-        # רק אם הבדיקה הידנית לא ודאית, ננסה GPT
-        system_prompt = """אתה מסווג הודעות של משתמשים. 
+        # משכים מהמטמון; בקשות ל-Spotify רק אם נדרשת הגבלת משך - כל התוכניות מהסבב נפתרות יחד
+        durations, _ = await resolve_episode_durations(
+            [show_id for show_id, _ in candidates], self.token,
+            client=self.client, cache=self.show_cache, fetch_missing=bool(max_duration)
+        )
         
-        הצ'טבוט שלנו מיועד להמליץ על פודקאסטים בלבד.
+        all_results = []
         
-        החזר JSON עם השדה הבא:
-        {
-            "is_podcast_related": true/false,
-            "confidence": 0.0-1.0,
-            "reason": "הסבר קצר למה זה קשור או לא קשור לפודקאסטים"
-        }
+        for show_id, show in candidates:
+            duration_minutes = self._duration_minutes(durations.get(show_id))
+            if max_duration and duration_minutes and duration_minutes > max_duration:
+                continue
+            all_results.append(self.podcasts.add(Podcast.from_spotify(show, duration_minutes)))
         
-        דוגמאות לבקשות שקשורות לפודקאסטים (is_podcast_related: true):
-        - "רוצה פודקאסט על ספורט"
-        - "משהו לשמוע על טכנולוגיה"
-        - "תכנית רדיו על חדשות"
-        - "איזה תוכן אודיו על בישול"
-        - "שיחות על פסיכולוגיה"
-        - "המלצה לתוכנית על עסקים"
-        
-        דוגמאות לבקשות שלא קשורות לפודקאסטים (is_podcast_related: false):
-        - "מה מזג האוויר?"
-        - "איך קוראים לך?"
-        - "מתי הפסחא?"
-        - "היי"
-        - "תודה"
-        - "מה השעה?"
-        - "איך מגיעים לתל אביב?"
-        
-        חשוב: גם אם המשתמש כותב נושא כללי כמו "ספורט" או "טכנולוגיה" - אם זה יכול להיות בקשה לפודקאסט, החזר true."""
+        # אותה תוכנית חוזרת מכמה וריאציות של השאילתה - מאחדים לפי מזהה
+        return merge_duplicates(all_results)[:limit]
 
+    async def _search_shows(self, search_query, limit, market, offset=0):
+        """בקשת חיפוש בודדת (דרך מטמון החיפושים) - מחזירה את רשימת התוכניות"""
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"בדוק אם הבקשה הזו קשורה לפודקאסטים: '{user_text}'"}
-                ],
-                temperature=0.1,
-                max_tokens=200
+            return await search_shows(
+                search_query, self.token, limit=limit, market=market,
+                client=self.client, cache=self.search_cache, show_cache=self.show_cache, offset=offset
             )
-            
-            result = json.loads(response.choices[0].message.content)
-            print(f"🔍 GPT check for '{user_text}': {result}")
-            return result
-            
-        except Exception as e:
-            print(f"Error in podcast relevance check: {e}")
-            return manual_check
+        except SpotifyError as e:
+            # ה-429 כבר נוסה שוב בלקוח; שאר הווריאציות של השאילתה ממשיכות בלי זו
+            print(f"⚠️ Spotify search failed for '{search_query}' ({e.status_code})")
+            return []
+
+    async def get_episode_duration(self, show_id):
+        """קבלת משך הפרק האחרון"""
+        durations, _ = await resolve_episode_durations([show_id], self.token, client=self.client, cache=self.show_cache)
+        return self._duration_minutes(durations.get(show_id))
+
+    @staticmethod
+    def _duration_minutes(minutes):
+        """עיגול משך לדקה עשרונית אחת (None אם לא ידוע)"""
+        return round(minutes, 1) if minutes and minutes > 0 else None
+
+class GPTAnalyzer:
+    # תגובה לכל קטגוריית reply_* בטבלת הביטויים - הראשונה שמתאימה נבחרת
+    NON_PODCAST_REPLIES = [
+        ('reply_weather', "🌤️ אני מתמחה רק במתן המלצות על פודקאסטים, לא במזג האוויר.\n\nאם אתה מחפש פודקאסט על מטאורולוגיה או מדעי האטמוספירה - אני אשמח לעזור! 🎧"),
+        ('reply_time', "⏰ אני לא יודע מה השעה, אבל אני יכול להמליץ לך על פודקאסטים מעולים!\n\nמה מעניין אותך לשמוע? 🎧"),
+        ('reply_greeting', "👋 שלום! אני SHMALI - הבוט להמלצות פודקאסטים!\n\nספר לי איזה נושא מעניין אותך ואמצא לך פודקאסט מושלם! 🎧"),
+        ('reply_thanks', "😊 אין בעד מה! האם תרצה עוד המלצות על פודקאסטים? פשוט ספר לי איזה נושא מעניין אותך! 🎧"),
+        ('reply_travel', "🗺️ אני לא מומחה בניווט, אבל אני יכול להמליץ לך על פודקאסטים נהדרים לדרך!\n\nאיזה נושא תרצה לשמוע בנסיעה? 🎧"),
+    ]
+
+    def __init__(self, cache=None, phrases=None, sessions=None):
+        # user_id -> הניתוחים האחרונים, במאגר המצב המשותף (עם תוקף ופינוי)
+        self.conversation_history = (sessions or get_session_store()).view('history')
+        self.cache = cache or get_analysis_cache()
+        # כל הבדיקות על אותה הודעה חולקות סריקה אחת (המאתר זוכר את ההודעות האחרונות)
+        self.phrases = phrases or get_phrase_matcher()
+        # אוצר המילים שהניתוח המקומי מכסה במלואו
+        self.known_words = set(STOPWORDS) | set(LANGUAGE_WORDS) | set(NUMBER_WORDS) | LOCAL_ANALYSIS_WORDS
+        for category, phrases in self.phrases.tables.items():
+            if category.startswith('topic:') or category in LOCAL_ANALYSIS_PHRASES:
+                self.known_words.update(word for phrase in phrases for word in tokenize(phrase))
+        # מסלול ניתוח -> קריאות, זמן מצטבר וטוקנים
+        self.analysis_stats = {}
     
     def strict_manual_check(self, user_text):
         """בדיקה ידנית קשיחה מאוד לבקשות שלא קשורות לפודקאסטים"""
-        text_lower = user_text.lower().strip()
-        
-        # רשימה מורחבת של ביטויים שבוודאות לא קשורים לפודקאסטים
-        definitely_not_podcast = [
-            # מזג אוויר
-            'מה מזג האוויר', 'מזג האוויר', 'weather', 'טמפרטורה', 
-            'גשם', 'שמש', 'שלג', 'רוח', 'עננים', 'חם', 'קר',
-            
-            # זמן ותאריכים
-            'מה השעה', 'איזה שעה', 'מה הזמן', 'מתי', 'תאריך',
-            'יום', 'חודש', 'שנה', 'מחר', 'אתמול',
-            
-            # ברכות וחברותיות
-            'היי', 'שלום', 'hello', 'hi', 'בוקר טוב', 'לילה טוב',
-            'מה שלומך', 'איך הולך', 'מה נשמע',
-            
-            # תודות
-            'תודה', 'thanks', 'תודה רבה', 'אין בעד מה',
-            
-            # שאלות זהות
-            'איך קוראים לך', 'מי אתה', 'מה השם שלך', 'מה אתה',
-            
-            # ניווט ומיקום
-            'איך מגיעים', 'איפה נמצא', 'דרך', 'נסיעה', 'כתובת',
-            
-            # חגים ואירועים
-            'מתי פסח', 'מתי ראש השנה', 'חג', 'חגים',
-            
-            # שאלות כלליות
-            'למה', 'איך', 'מתי', 'איפה', 'מי', 'מה זה',
-            
-            # בעיות טכניות
-            'לא עובד', 'שגיאה', 'בעיה', 'תקלה'
-        ]
+        text_lower = user_text.lower()
+        matches = self.phrases.match(text_lower)
         
-        # בדיקה אם יש התאמה מדויקת
-        for phrase in definitely_not_podcast:
-            if phrase in text_lower:
-                return {
-                    "is_podcast_related": False,
-                    "confidence": 0.95,
-                    "reason": f"מכיל ביטוי שלא קשור לפודקאסטים: '{phrase}'"
-                }
+        # ביטוי שבוודאות לא קשור לפודקאסטים (הראשון לפי סדר הטבלה)
+        if 'strict_not_podcast' in matches:
+            return {
+                "is_podcast_related": False,
+                "confidence": 0.95,
+                "reason": f"מכיל ביטוי שלא קשור לפודקאסטים: '{matches['strict_not_podcast'][0]}'"
+            }
         
         # בדיקה אם זה רק שאלה קצרה (פחות מ-4 מילים) ללא מילות מפתח של פודקאסטים
-        words = text_lower.split()
-        if len(words) <= 3:
-            podcast_keywords = [
-                'פודקאסט', 'podcast', 'לשמוע', 'האזנה', 'תוכנית',
-                'שיחות', 'ראיונות', 'תוכן', 'אודיו', 'רדיו', 'עניין'
-            ]
-            
-            has_podcast_keyword = any(keyword in text_lower for keyword in podcast_keywords)
-            if not has_podcast_keyword:
-                return {
-                    "is_podcast_related": False,
-                    "confidence": 0.85,
-                    "reason": "שאלה קצרה ללא מילות מפתח של פודקאסטים"
-                }
+        if len(text_lower.split()) <= 3 and 'strict_podcast_hint' not in matches:
+            return {
+                "is_podcast_related": False,
+                "confidence": 0.85,
+                "reason": "שאלה קצרה ללא מילות מפתח של פודקאסטים"
+            }
         
         # אם לא מצאנו סיבה ברורה לדחות, נחזיר ביטחון נמוך
         return {
@@ -301,34 +271,18 @@ class GPTAnalyzer:
     
     def manual_relevance_check(self, user_text):
         """בדיקה ידנית כאשר GPT לא עובד"""
-        text_lower = user_text.lower()
-        
-        # מילים שברור שלא קשורות לפודקאסטים
-        non_podcast_keywords = [
-            'מזג האוויר', 'weather', 'טמפרטורה', 'גשם', 'שמש',
-            'מה השעה', 'זמן', 'תאריך', 'יום',
-            'היי', 'שלום', 'hello', 'hi',
-            'תודה', 'thanks', 'בוקר טוב', 'לילה טוב',
-            'איך קוראים לך', 'מי אתה', 'מה זה',
-            'איך מגיעים', 'נסיעה', 'דרך', 'מיקום'
-        ]
+        matches = self.phrases.match(user_text.lower())
         
         # אם יש מילת מפתח ברורה שלא קשורה לפודקאסטים
-        if any(keyword in text_lower for keyword in non_podcast_keywords):
+        if 'fallback_not_podcast' in matches:
             return {
                 "is_podcast_related": False,
                 "confidence": 0.9,
                 "reason": "מכיל מילות מפתח שלא קשורות לפודקאסטים"
             }
         
-        # מילים שמרמזות על פודקאסטים
-        podcast_keywords = [
-            'פודקאסט', 'podcast', 'לשמוע', 'האזנה', 'תוכנית',
-            'שיחות', 'ראיונות', 'תוכן אודיו', 'רדיו'
-        ]
-        
         # אם יש מילת מפתח ברורה לפודקאסטים
-        if any(keyword in text_lower for keyword in podcast_keywords):
+        if 'fallback_podcast_hint' in matches:
             return {
                 "is_podcast_related": True,
                 "confidence": 0.9,
@@ -342,132 +296,191 @@ class GPTAnalyzer:
             "reason": "לא מזוהה כבקשה לפודקאסט"
         }
     
+    def local_analysis(self, user_text):
+        """ניתוח מקומי בלי GPT - רק כשהכללים בטוחים גם בסיווג וגם בחילוץ, אחרת None"""
+        text_lower = user_text.lower()
+        relevance = self.manual_relevance_check(user_text)
+        if not relevance["is_podcast_related"] or relevance["confidence"] < 0.9:
+            return None
+
+        result = self.basic_analysis(user_text)
+        if not result["topics"]:
+            return None
+        # כל מילה צריכה להיות מוכרת (גם בלי אותיות השימוש - 'וספורט'); אחרת יש בבקשה עוד משהו
+        # ('ספורט ופסיכולוגיה', 'בלי פוליטיקה') שהניתוח המקומי היה מפיל - משאירים ל-GPT
+        if not all(self.is_known_word(token) for token in tokenize(text_lower)):
+            return None
+        # זמן שהביטוי הרגולרי לא הצליח לפרש ("חצי שעה") - משאירים ל-GPT
+        if result["duration_max"] is None and re.search(r'דקות|דקה|שעה|שעות|minute', text_lower):
+            return None
+
+        # מילות החיפוש הן מילות הנושא שזוהו, לא סתם שלוש המילים הראשונות
+        matches = self.phrases.match(text_lower)
+        result["keywords"] = [keyword for topic in result["topics"] for keyword in matches[f'topic:{topic}']]
+        result["is_podcast_related"] = True
+        return result
+
+    def is_known_word(self, token):
+        """מילה שהניתוח המקומי מבין. הורדת אותיות שימוש לא נעצרת במילת קישור ('בלי' היא לא ב+לי)"""
+        if token.isdigit() or token in self.known_words:
+            return True
+        return any(variant in self.known_words and variant not in STOPWORDS for variant in token_variants(token)[1:])
+
+    def record_analysis(self, path, started, response=None):
+        """רישום זמן וצריכת טוקנים לכל מסלול ניתוח (manual_reject / local / llm / fallback)"""
+        elapsed = time.perf_counter() - started
+        usage = (response or {}).get('usage') or {}
+        stats = self.analysis_stats.setdefault(path, {'calls': 0, 'seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0})
+        stats['calls'] += 1
+        stats['seconds'] += elapsed
+        stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        stats['completion_tokens'] += usage.get('completion_tokens', 0)
+        print(f"🧠 Analysis path '{path}': {elapsed:.2f}s, {usage.get('total_tokens', 0)} tokens")
+
+    def remember_analysis(self, user_id, user_text, result):
+        """שמירת האינטראקציה בהיסטוריה המוגבלת של המשתמש"""
+        history = self.conversation_history.get(user_id, [])
+        history.append({
+            'user_input': user_text,
+            'analysis': result
+        })
+        self.conversation_history[user_id] = history[-5:]
+
     async def analyze_request(self, user_text, user_id):
-        """ניתוח בקשת המשתמש עם GPT - כולל בדיקת רלוונטיות"""
-        
-        # קודם בודקים אם זה קשור לפודקאסטים
-        relevance_check = await self.check_podcast_relevance(user_text)
-        
+        """ניתוח בקשת המשתמש - כללים מקומיים קודם, ואם צריך קריאת GPT אחת לסיווג ולחילוץ יחד"""
+        started = time.perf_counter()
+
+        # בדיקה ידנית קשיחה - דחייה בטוחה בלי GPT
+        manual_check = self.strict_manual_check(user_text)
+        if manual_check["confidence"] > 0.8:
+            print(f"🔍 Manual strict check for '{user_text}': {manual_check}")
+            self.record_analysis('manual_reject', started)
+            return {
+                "is_podcast_related": False,
+                "reason": manual_check["reason"],
+                "suggested_response": self.generate_non_podcast_response(user_text)
+            }
+
+        # בקשה ברורה שהכללים יודעים לפרש - בלי GPT בכלל
+        result = self.local_analysis(user_text)
+        if result is not None:
+            self.record_analysis('local', started)
+            self.remember_analysis(user_id, user_text, result)
+            return result
+
+        # הודעה זהה (אחרי נרמול) כבר נותחה - בלי GPT. המטמון על SQLite - מחוץ ללולאה
+        result = await asyncio.to_thread(self.cache.get, user_text)
+        if result is not None:
+            print(f"💾 Analysis cache hit for '{user_text}' (hit rate {self.cache.hit_rate():.0%})")
+            self.record_analysis('cache', started)
+        else:
+            result = await self.llm_analysis(user_text, user_id, started)
+            if result is None:
+                basic_result = self.basic_analysis(user_text)
+                basic_result["is_podcast_related"] = True
+                self.record_analysis('fallback', started)
+                return basic_result
+            await asyncio.to_thread(self.cache.set, user_text, result)
+
         # אם זה לא קשור לפודקאסטים עם ביטחון גבוה
-        if not relevance_check["is_podcast_related"] and relevance_check["confidence"] > 0.7:
+        confidence = result.pop("confidence", 1.0)
+        reason = result.pop("reason", "")
+        if not result.get("is_podcast_related", True) and confidence > 0.7:
             return {
                 "is_podcast_related": False,
-                "reason": relevance_check["reason"],
+                "reason": reason,
                 "suggested_response": self.generate_non_podcast_response(user_text)
             }
-        
-        # אם זה קשור לפודקאסטים, ממשיכים לניתוח רגיל
+
+        result["is_podcast_related"] = True
+        self.remember_analysis(user_id, user_text, result)
+        return result
+
+    async def llm_analysis(self, user_text, user_id, started):
+        """קריאת GPT אחת לסיווג ולחילוץ יחד - מחזירה את ה-JSON הגולמי או None בכישלון"""
         history = self.conversation_history.get(user_id, [])
         context = ""
         if history:
             context = f"היסטוריית שיחה קודמת: {history[-2:]}"
         
-        system_prompt = f"""אתה עוזר המלצות פודקאסטים. נתח את הבקשה והחזר JSON עם המבנה הבא:
+        system_prompt = f"""אתה עוזר המלצות פודקאסטים. הצ'טבוט שלנו מיועד להמליץ על פודקאסטים בלבד.
+סווג את ההודעה ונתח אותה, והחזר JSON אחד עם המבנה הבא:
 
 {context}
 
 {{
+    "is_podcast_related": true/false,
+    "confidence": 0.0-1.0,
+    "reason": "הסבר קצר למה זה קשור או לא קשור לפודקאסטים",
     "topics": ["רשימת נושאים שמעניינים את המשתמש"],
     "duration_max": מספר דקות מקסימלי או null,
     "language_preference": "hebrew" או "english" או null,
     "keywords": ["מילות מפתח לחיפוש"],
-    "user_intent": "תיאור כוונת המשתמש",
-    "is_podcast_related": true
+    "user_intent": "תיאור כוונת המשתמש"
 }}
 
+דוגמאות לבקשות שקשורות לפודקאסטים (is_podcast_related: true):
+- "רוצה פודקאסט על ספורט"
+- "משהו לשמוע על טכנולוגיה"
+- "תכנית רדיו על חדשות"
+- "שיחות על פסיכולוגיה"
+
+דוגמאות לבקשות שלא קשורות לפודקאסטים (is_podcast_related: false):
+- "מה מזג האוויר?"
+- "איך קוראים לך?"
+- "מה השעה?"
+- "איך מגיעים לתל אביב?"
+
 חשוב:
+- גם אם המשתמש כותב נושא כללי כמו "ספורט" או "טכנולוגיה" - אם זה יכול להיות בקשה לפודקאסט, החזר true
+- אם הבקשה לא קשורה לפודקאסטים - topics ו-keywords ריקים
 - אם המשתמש מבקש "באנגלית" או "english" - language_preference: "english"
 - אם המשתמש מבקש "בעברית" או לא מציין שפה - language_preference: "hebrew"
 - אם המשתמש מציין זמן (10 דקות, 5 דקות) - duration_max: המספר"""
 
         try:
+            # הטעינה הראשונה של openai לוקחת זמן - ב-thread, כדי לא לעצור את שאר המשתמשים
+            openai = await asyncio.to_thread(get_openai)
             response = await openai.ChatCompletion.acreate(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_text}
                 ],
-                temperature=0.7,
-                max_tokens=300
+                temperature=0.2,
+                max_tokens=400
             )
             
             result = json.loads(response.choices[0].message.content)
-            result["is_podcast_related"] = True
-            
-            # שמירת האינטראקציה
-            if user_id not in self.conversation_history:
-                self.conversation_history[user_id] = []
-            self.conversation_history[user_id].append({
-                'user_input': user_text,
-                'analysis': result
-            })
-            
-            # שמירה על היסטוריה מוגבלת
-            if len(self.conversation_history[user_id]) > 5:
-                self.conversation_history[user_id] = self.conversation_history[user_id][-5:]
-            
+            print(f"🔍 GPT analysis for '{user_text}': {result}")
+            self.record_analysis('llm', started, response)
             return result
-            
         except Exception as e:
             print(f"GPT Analysis error: {e}")
-            basic_result = self.basic_analysis(user_text)
-            basic_result["is_podcast_related"] = True
-            return basic_result
+            return None
     
     def generate_non_podcast_response(self, user_text):
         """יוצר תגובה מתאימה לבקשות שלא קשורות לפודקאסטים"""
-        
-        text_lower = user_text.lower()
-        
-        if any(word in text_lower for word in ['מזג', 'weather', 'טמפרטורה']):
-            return "🌤️ אני מתמחה רק במתן המלצות על פודקאסטים, לא במזג האוויר.\n\nאם אתה מחפש פודקאסט על מטאורולוגיה או מדעי האטמוספירה - אני אשמח לעזור! 🎧"
-        
-        elif any(word in text_lower for word in ['שעה', 'זמן', 'תאריך']):
-            return "⏰ אני לא יודע מה השעה, אבל אני יכול להמליץ לך על פודקאסטים מעולים!\n\nמה מעניין אותך לשמוע? 🎧"
-        
-        elif any(word in text_lower for word in ['היי', 'שלום', 'hello']):
-            return "👋 שלום! אני SHMALI - הבוט להמלצות פודקאסטים!\n\nספר לי איזה נושא מעניין אותך ואמצא לך פודקאסט מושלם! 🎧"
-        
-        elif any(word in text_lower for word in ['תודה', 'thanks']):
-            return "😊 אין בעד מה! האם תרצה עוד המלצות על פודקאסטים? פשוט ספר לי איזה נושא מעניין אותך! 🎧"
-        
-        elif any(word in text_lower for word in ['דרך', 'נסיעה', 'מיקום']):
-            return "🗺️ אני לא מומחה בניווט, אבל אני יכול להמליץ לך על פודקאסטים נהדרים לדרך!\n\nאיזה נושא תרצה לשמוע בנסיעה? 🎧"
-        
-        else:
-            return f"🤖 אני מתמחה רק במתן המלצות על פודקאסטים.\n\nאם '{user_text}' קשור לנושא שתרצה לשמוע עליו בפודקאסט - ספר לי יותר פרטים! 🎧"
+        matches = self.phrases.match(user_text.lower())
+        for category, reply in self.NON_PODCAST_REPLIES:
+            if category in matches:
+                return reply
+        return f"🤖 אני מתמחה רק במתן המלצות על פודקאסטים.\n\nאם '{user_text}' קשור לנושא שתרצה לשמוע עליו בפודקאסט - ספר לי יותר פרטים! 🎧"
     
     def basic_analysis(self, text):
         """ניתוח בסיסי אם GPT נכשל"""
         text_lower = text.lower()
+        matches = self.phrases.match(text_lower)
         
-        # זיהוי שפה
-        language_preference = None
-        if any(word in text_lower for word in ['באנגלית', 'אנגלית', 'english', 'in english']):
-            language_preference = 'english'
-        elif any(word in text_lower for word in ['בעברית', 'עברית']):
-            language_preference = 'hebrew'
-        else:
-            language_preference = 'hebrew'
+        # זיהוי שפה (ברירת המחדל עברית)
+        language_preference = 'english' if 'language_english' in matches else 'hebrew'
         
         # זיהוי משך זמן
         duration_match = re.search(r'(\d+)\s*דק', text)
         duration_max = int(duration_match.group(1)) if duration_match else None
         
         # זיהוי נושאים
-        topics = []
-        topic_keywords = {
-            'ספורט': ['ספורט', 'כדורגל', 'כדורסל', 'אימון'],
-            'טכנולוגיה': ['טכנולוגיה', 'מחשב', 'תכנות', 'אפליקציה'],
-            'בריאות': ['בריאות', 'תזונה', 'דיאטה', 'רפואה'],
-            'קומדיה': ['קומדיה', 'מצחיק', 'הומור', 'צחוק'],
-            'חדשות': ['חדשות', 'פוליטיקה', 'אקטואליה'],
-            'עסקים': ['עסקים', 'כסף', 'יזמות', 'השקעות']
-        }
-        
-        for topic, keywords in topic_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                topics.append(topic)
+        topics = [topic for topic in self.phrases.categories('topic:') if f'topic:{topic}' in matches]
         
         return {
             "topics": topics,
@@ -481,19 +494,19 @@ class SimilarityScorer:
     """מחלקה לחישוב ציון דמיון 70%-30%"""
     
     @staticmethod
-    def calculate_text_similarity(text1, text2):
-        """חישוב דמיון טקסטואלי בין שני טקסטים"""
-        return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+    def calculate_text_similarity(text1, text2, similarity=None):
+        """חישוב דמיון טקסטואלי בין שני טקסטים (similarity - מנוע הקטלוג; ברירת מחדל לפי SIMILARITY_BACKEND)"""
+        return (similarity or get_similarity_backend()).similarity(text1, text2)
     
     @staticmethod
-    def calculate_topic_similarity(user_analysis, podcast_data):
+    def calculate_topic_similarity(user_analysis, podcast_data, similarity=None):
         """חישוב התאמה לנושאים עיקריים (70% מהציון)"""
         user_topics = user_analysis.get('topics', [])
         user_keywords = user_analysis.get('keywords', [])
         
-        podcast_name = podcast_data.get('name', '').lower()
-        podcast_description = podcast_data.get('description', '').lower()
-        podcast_publisher = podcast_data.get('publisher', '').lower()
+        podcast_name = podcast_data.name.lower()
+        podcast_description = podcast_data.description.lower()
+        podcast_publisher = podcast_data.publisher.lower()
         
         # חיפוש התאמות ישירות
         direct_matches = 0
@@ -521,11 +534,13 @@ class SimilarityScorer:
         # חישוב ציון דמיון טקסטואלי
         name_similarity = SimilarityScorer.calculate_text_similarity(
             ' '.join(user_topics + user_keywords), 
-            podcast_name
+            podcast_name,
+            similarity
         )
         description_similarity = SimilarityScorer.calculate_text_similarity(
             ' '.join(user_topics + user_keywords), 
-            podcast_description
+            podcast_description,
+            similarity
         )
         
         # משקל לחישוב הסופי
@@ -545,7 +560,7 @@ class SimilarityScorer:
         
         # בדיקת שפה (50% מהמטאדטה)
         user_language = user_analysis.get('language_preference')
-        podcast_languages = podcast_data.get('languages', [])
+        podcast_languages = podcast_data.languages
         
         if user_language:
             checks += 1
@@ -557,7 +572,7 @@ class SimilarityScorer:
         
         # בדיקת משך זמן (30% מהמטאדטה)
         user_max_duration = user_analysis.get('duration_max')
-        podcast_duration = podcast_data.get('duration_minutes')
+        podcast_duration = podcast_data.duration_minutes
         
         if user_max_duration and podcast_duration:
             checks += 1
@@ -568,7 +583,7 @@ class SimilarityScorer:
             # אם הפודקאסט ארוך מדי, לא מוסיפים ציון
         
         # בדיקת כמות פרקים (20% מהמטאדטה)
-        total_episodes = podcast_data.get('total_episodes', 0)
+        total_episodes = podcast_data.total_episodes
         if total_episodes > 0:
             checks += 1
             # העדפה לפודקאסטים עם כמות סבירה של פרקים
@@ -581,11 +596,11 @@ class SimilarityScorer:
         return metadata_score if checks > 0 else 0.5
     
     @staticmethod
-    def calculate_similarity_score(user_analysis, podcast_data):
+    def calculate_similarity_score(user_analysis, podcast_data, similarity=None):
         """חישוב ציון דמיון מסופי (70% נושאים + 30% מטאדטה)"""
         
         # 70% - התאמה לנושאים עיקריים
-        topic_score = SimilarityScorer.calculate_topic_similarity(user_analysis, podcast_data)
+        topic_score = SimilarityScorer.calculate_topic_similarity(user_analysis, podcast_data, similarity)
         
         # 30% - התאמה למטאדטה
         metadata_score = SimilarityScorer.calculate_metadata_similarity(user_analysis, podcast_data)
@@ -596,59 +611,119 @@ class SimilarityScorer:
         return round(final_score, 3)
 
 class ShmaliBot:
-    def __init__(self):
+    def __init__(self, shared_catalog=False, build_pools=True):
+        """shared_catalog - תהליך worker: הקטלוג נטען רק מהבנייה הבינארית המשותפת (שתהליך החזית מעדכן),
+        ונטען מחדש כשה-manifest שלה מתחלף. build_pools=False - מאגרי ההמלצות רק נטענים מהדיסק
+        (תהליך אחר בונה אותם)"""
         self.spotify = SpotifyAPI(CLIENT_ID, CLIENT_SECRET)
         self.gpt_analyzer = GPTAnalyzer()
         self.similarity_scorer = SimilarityScorer()
-        self.load_local_data()
-        self.shown_recommendations = {}
-        self.available_recommendations = {}
+        # אצוות גדולות של חישובי דמיון רצות בתהליכים אחרים (ראו scoring_pool.py)
+        self.scoring_pool = get_scoring_pool()
+        self.podcasts = self.spotify.podcasts
+        self.shared_catalog = shared_catalog
+        # שינוי בקובץ הדטהסט -> קטלוג חדש נבנה ברקע ומוחלף בלי להפעיל מחדש (ובלי לאבד את מצב המשתמשים)
+        if shared_catalog:
+            self.catalog_reloader = CatalogReloader(os.path.join(CATALOG_DIR, MANIFEST_NAME), self.load_local_data)
+        else:
+            self.catalog_reloader = CatalogReloader(DATASET_CSV, self.reload_local_data)
+        self.catalog = None
+        self.catalog_ready = threading.Event()
+        if CATALOG_BACKGROUND_LOAD:
+            threading.Thread(target=self.load_local_data_in_background, name='catalog-loader', daemon=True).start()
+        else:
+            self.load_local_data_in_background()
+        # מצב המשתמשים במאגר עם תוקף ופינוי; המועמדים נשמרים כמזהים לטבלת תוכניות משותפת
+        self.sessions = get_session_store()
+        self.shown_recommendations = self.sessions.view('shown')
+        self.available_recommendations = self.sessions.view('candidates')
+        # מיקום הסמן ברשימה המדורגת ומספר העמודים הנוספים שכבר הובאו מ-Spotify
+        self.cursors = self.sessions.view('cursor')
+        self.extra_pages = self.sessions.view('extra_pages')
+        self.pending_searches = {}
+        # מועמדים מחושבים מראש לנושאים הנפוצים (ראו recommendation_pools.py) - מתרעננים ברקע אחרי העלייה
+        self.build_pools = build_pools
+        self.pools = RecommendationPools(self.gpt_analyzer.phrases.categories('topic:')) if RECOMMENDATION_POOLS else None
+    
+    def load_local_data_in_background(self):
+        """טעינת הקטלוג והפעלת המעקב אחרי הקובץ; החיפוש המקומי מחכה ל-catalog_ready"""
+        started = time.perf_counter()
+        try:
+            self.load_local_data()
+        except Exception as e:
+            # בלי קטלוג ממשיכים עם Spotify בלבד; קובץ מתוקן ייטען דרך המעקב
+            print(f"❌ שגיאה בטעינת הדטהסט המקומי: {e}")
+        finally:
+            self.catalog_ready.set()
+        record_startup_phase('catalog', started)
+        if CATALOG_RELOAD:
+            self.catalog_reloader.start()
     
     def load_local_data(self):
-        """טעינת נתונים מקומיים"""
+        """טעינת נתונים מקומיים - מהקטלוג הבינארי (mmap) אם הוא עדכני, אחרת מה-CSV"""
+        # קטלוג משותף לא נבדק מול ה-CSV - החזית בונה אותו מחדש, וה-manifest החדש יטען כאן
+        catalog = load_catalog(CATALOG_DIR, None if self.shared_catalog else DATASET_CSV)
+        self.binary_catalog = catalog is not None
+        if self.binary_catalog:
+            self.catalog = catalog
+            print(f"✅ נטענו {len(catalog)} פודקאסטים מקומיים (קטלוג בינארי)")
+            return
+        
+        import pandas as pd
         try:
-            self.df = pd.read_csv(DATASET_CSV)
-            print(f"✅ נטענו {len(self.df)} פודקאסטים מקומיים")
+            df = pd.read_csv(DATASET_CSV)
+            print(f"✅ נטענו {len(df)} פודקאסטים מקומיים")
+            print("💡 לעלייה מהירה יותר: python binary_catalog.py build")
         except FileNotFoundError:
             print("⚠️ לא נמצא קובץ נתונים מקומי")
-            self.df = pd.DataFrame()
-    
-    def search_local_dataset(self, analysis):
-        """חיפוש בדטהסט המקומי עם דירוג similarity"""
-        if self.df.empty:
-            return []
-        
-        local_results = []
-        topics = analysis.get('topics', [])
-        keywords = analysis.get('keywords', [])
-        language_pref = analysis.get('language_preference')
-        max_duration = analysis.get('duration_max')
+            df = pd.DataFrame()
         
-        for _, podcast in self.df.iterrows():
-            # המרה לפורמט סטנדרטי
-            podcast_data = {
-                'name': podcast.get('name', 'Unknown'),
-                'publisher': podcast.get('publisher', 'Unknown'),
-                'description': str(podcast.get('description', '')),
-                'url': podcast.get('url', '#'),
-                'duration_minutes': podcast.get('duration_minutes'),
-                'languages': [podcast.get('language', '')] if pd.notna(podcast.get('language')) else [],
-                'total_episodes': podcast.get('total_episodes', 0),
-                'source': 'local_dataset'
-            }
-            
-            # חישוב ציון דמיון
-            similarity_score = self.similarity_scorer.calculate_similarity_score(analysis, podcast_data)
-            
-            # סף מינימלי לקבלת פודקאסט
-            if similarity_score >= 0.3:
-                podcast_data['similarity_score'] = similarity_score
-                local_results.append(podcast_data)
+        # עמודות מנורמלות ומערכים לדירוג וקטורי - מחושבים פעם אחת
+        self.catalog = LocalCatalog(df)
+    
+    def reload_local_data(self):
+        """בניית קטלוג חדש מה-CSV שהשתנה והחלפתו בהשמה אחת (נקרא מה-thread של CatalogReloader).
+        רק שורות שהטקסט שלהן השתנה עוברות אינדוקס מחדש; אם עלינו מקטלוג בינארי - גם הוא נכתב מחדש וממופה"""
+        import pandas as pd
+        
+        started = time.perf_counter()
+        previous = self.catalog
+        source = source_stamp(DATASET_CSV)
+        df = pd.read_csv(DATASET_CSV)
+        
+        # מנוע וקטורי לומד לכל קטלוג עותק משלו (IDF מהדטהסט החדש) - זה שבשימוש לא משתנה
+        if self.binary_catalog:
+            # הווקטורים מחושבים בטעינת הקטלוג הממופה - בבנייה לא צריך אותם
+            built = LocalCatalog(df, similarity=get_similarity_backend('sequence'), previous=previous)
+            write_catalog(built, source, CATALOG_DIR)
+            catalog = load_catalog(CATALOG_DIR)
+        else:
+            catalog = built = LocalCatalog(df, previous=previous)
         
-        # מיון לפי ציון דמיון
-        local_results.sort(key=lambda x: x['similarity_score'], reverse=True)
+        self.catalog = catalog
+        print(f"🔄 הקטלוג המקומי נטען מחדש: {len(catalog)} פודקאסטים, {built.reindexed_rows} שורות אונדקסו מחדש "
+              f"({time.perf_counter() - started:.2f} שניות)")
+    
+    @property
+    def text_similarity(self):
+        """מנוע הדמיון של הקטלוג הנוכחי (ב-TF-IDF - עם ה-IDF שנלמד ממנו) לדירוג מועמדים מ-Spotify"""
+        catalog = self.catalog
+        return catalog.similarity if catalog is not None else get_similarity_backend()
+    
+    def search_local_dataset(self, analysis, limit=LOCAL_RESULTS_LIMIT):
+        """חיפוש בדטהסט המקומי עם דירוג similarity (וקטורי, מחזיר את ה-top-k)"""
+        # בעלייה הקטלוג עוד נטען ברקע - מחכים לו עד הדדליין של החיפוש
+        if not self.catalog_ready.wait(SEARCH_DEADLINE):
+            return []
+        # הקטלוג נלקח פעם אחת - טעינה מחדש באמצע החיפוש לא משפיעה עליו
+        catalog = self.catalog
+        if catalog is None or not len(catalog):
+            return []
         
-        return local_results
+        return [
+            Recommendation(self.podcasts.add(Podcast.from_row(catalog.record(index))), 'local_dataset', similarity_score)
+            for index, similarity_score in catalog.score(analysis, limit, pool=self.scoring_pool)
+        ]
     
     async def get_recommendations(self, analysis, user_id):
         """קבלת המלצות משילוב של Spotify והדטהסט המקומי עם דירוג similarity"""
@@ -662,97 +737,251 @@ class ShmaliBot:
         if user_id not in self.available_recommendations or self.is_new_topic(analysis, user_id):
             print(f"🔄 Resetting recommendations for user {user_id} (new topic or first time)")
             
-            self.shown_recommendations[user_id] = []
-            self.available_recommendations[user_id] = []
+            self.cancel_pending_search(user_id)
+            self.sessions.update(user_id, shown=[], candidates=[], cursor=0, extra_pages=0)
             
-            all_recommendations = []
-            
-            # חיפוש בספוטיפיי קודם
-            topics = analysis.get('topics', [])
-            if topics:
-                print(f"🎵 Searching Spotify for topics: {topics}")
-                for topic in topics:
-                    try:
-                        spotify_results = self.spotify.search_podcasts(
-                            query=topic,
-                            max_duration=analysis.get('duration_max'),
-                            language_preference=analysis.get('language_preference'),
-                            limit=10
-                        )
-                        print(f"   Found {len(spotify_results)} results for topic '{topic}'")
-                        for result in spotify_results:
-                            result['source'] = 'spotify'
-                            # חישוב ציון דמיון לתוצאות Spotify
-                            result['similarity_score'] = self.similarity_scorer.calculate_similarity_score(analysis, result)
-                        all_recommendations.extend(spotify_results)
-                    except Exception as e:
-                        print(f"❌ Error searching Spotify for topic '{topic}': {e}")
-            
-            # אם אין נושאים ספציפיים, חפש לפי מילות מפתח
-            if len(all_recommendations) < 5 and analysis.get('keywords'):
-                print(f"🔍 Searching by keywords: {analysis['keywords']}")
-                query = ' '.join(analysis['keywords'][:2])
-                try:
-                    spotify_results = self.spotify.search_podcasts(
-                        query=query,
-                        max_duration=analysis.get('duration_max'),
-                        language_preference=analysis.get('language_preference'),
-                        limit=10
-                    )
-                    print(f"   Found {len(spotify_results)} results for keywords")
-                    for result in spotify_results:
-                        result['source'] = 'spotify'
-                        result['similarity_score'] = self.similarity_scorer.calculate_similarity_score(analysis, result)
-                    all_recommendations.extend(spotify_results)
-                except Exception as e:
-                    print(f"❌ Error searching Spotify by keywords: {e}")
-            
-            # חיפוש בדטהסט המקומי אחרי Spotify
-            print(f"📁 Searching local dataset...")
-            try:
-                local_results = self.search_local_dataset(analysis)
-                print(f"   Found {len(local_results)} local results")
-                all_recommendations.extend(local_results)
-            except Exception as e:
-                print(f"❌ Error searching local dataset: {e}")
-            
-            # הסרת כפילויות
-            seen = set()
-            unique_recommendations = []
-            for rec in all_recommendations:
-                if rec['name'] not in seen:
-                    seen.add(rec['name'])
-                    unique_recommendations.append(rec)
+            # נושא נפוץ - המועמדים כבר מוכנים במאגר, נשאר רק הדירוג האישי
+            pooled = self.pools.lookup(analysis) if self.pools is not None else None
+            ranked = await self.rank_pooled(analysis, pooled) if pooled else None
+            if ranked:
+                print(f"🏊 Serving {len(ranked)} candidates from precomputed pools")
+                self.available_recommendations[user_id] = ranked
+            else:
+                # האיסוף והדירוג רצים כמשימה - במצב הדרגתי עונים כבר עם ההתאמה הטובה הראשונה
+                first_candidate = asyncio.get_running_loop().create_future() if PROGRESSIVE_RESULTS else None
+                build = asyncio.create_task(self.build_recommendations(analysis, user_id, first_candidate))
+                self.pending_searches[user_id] = build
+                
+                if first_candidate is not None:
+                    await asyncio.wait({first_candidate, build}, return_when=asyncio.FIRST_COMPLETED)
+                    if not build.done():
+                        rec = first_candidate.result()
+                        self.shown_recommendations[user_id] = [rec.key]
+                        print(f"⚡ Returning first good match (score {rec.similarity_score}), ranking continues in background: {rec.name}")
+                        return [rec]
+                
+                await self.wait_for_search(build)
+        else:
+            print(f"♻️ Using existing recommendations for user {user_id}")
             
-            print(f"📊 Total unique recommendations: {len(unique_recommendations)}")
+            # אם הדירוג המלא עוד רץ ברקע - מחכים לו כדי לענות מהרשימה השלמה
+            pending = self.pending_searches.get(user_id)
+            if pending is not None and not pending.done():
+                print(f"⏳ Waiting for background ranking for user {user_id}")
+                await self.wait_for_search(pending)
+        
+        # מחזירים המלצה אחת שעוד לא הוצגה
+        rec = await self.next_recommendation(analysis, user_id)
+        if rec is not None:
+            print(f"✅ Returning recommendation: {rec.name}")
+            return [rec]
+        
+        # אם נגמרו ההמלצות (גם אחרי דפדוף ב-Spotify)
+        print(f"❌ No more recommendations available for user {user_id}")
+        return []
+    
+    async def next_recommendation(self, analysis, user_id):
+        """ההמלצה הבאה מהסמן של המשתמש - מדלגים על מה שכבר הוצג (לפי מזהה התוכנית).
+        כשהרשימה נגמרת מביאים את העמוד הבא מ-Spotify במקום לסיים"""
+        entries = self.available_recommendations.raw(user_id, [])
+        shown = self.sessions.shown(user_id)
+        cursor = self.cursors.get(user_id, 0)
+        
+        print(f"📝 Available: {len(entries)}, Shown: {len(shown)}, Cursor: {cursor}")
+        
+        while True:
+            while cursor < len(entries):
+                entry = entries[cursor]
+                cursor += 1
+                if entry[0] in shown:
+                    continue
+                # רק המועמד שנבחר מפוענח מטבלת התוכניות
+                decoded = self.sessions.decode_candidates([entry], user_id)
+                if decoded:
+                    self.sessions.mark_shown(user_id, entry[0], cursor)
+                    return decoded[0]
             
-            # מיון לפי ציון דמיון במקום ערבוב רנדומלי
-            unique_recommendations.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
+            page = await self.fetch_next_page(analysis, user_id, shown.keys | {entry[0] for entry in entries})
+            if not page:
+                self.cursors[user_id] = cursor
+                return None
+            self.sessions.append_candidates(user_id, page)
+            entries = self.available_recommendations.raw(user_id, [])
+    
+    async def fetch_next_page(self, analysis, user_id, exclude):
+        """העמודים הבאים של חיפושי Spotify (offset) עד שנמצאים מועמדים חדשים; [] אם אין עוד"""
+        queries = analysis.get('topics') or [' '.join(analysis.get('keywords', [])[:2])]
+        queries = [query for query in queries if query]
+        
+        while queries and self.extra_pages.get(user_id, 0) < MAX_EXTRA_PAGES:
+            page = self.extra_pages.get(user_id, 0) + 1
+            self.extra_pages[user_id] = page
+            # צעד של limit ולא של החלון המלא (פי 2): העמוד הקודם שמר רק את limit הראשונות,
+            # והחפיפה עם מה שכבר נשמר מסוננת ב-exclude
+            offset = page * SPOTIFY_RESULTS_LIMIT
+            print(f"📄 Fetching Spotify page {page} (offset {offset}) for user {user_id}")
             
-            # שמירה עם לוג ציונים
-            print(f"📊 Top recommendations for user {user_id}:")
-            for i, rec in enumerate(unique_recommendations[:5]):
-                print(f"  {i+1}. {rec['name']} - Score: {rec.get('similarity_score', 'N/A')}")
+            batches = await asyncio.gather(
+                *(self.search_spotify_source(query, analysis, offset) for query in queries), return_exceptions=True
+            )
+            found = False
+            fresh = {}
+            for batch in batches:
+                if isinstance(batch, Exception):
+                    print(f"❌ Error fetching next page: {batch}")
+                    continue
+                found = found or bool(batch)
+                for rec in batch:
+                    if rec.key not in exclude and rec.key not in fresh:
+                        fresh[rec.key] = rec
             
-            self.available_recommendations[user_id] = unique_recommendations
-        else:
-            print(f"♻️ Using existing recommendations for user {user_id}")
+            if fresh:
+                return sorted(fresh.values(), key=lambda rec: rec.similarity_score, reverse=True)
+            if not found:
+                # Spotify לא החזיר כלום - אין טעם לנסות עמודים נוספים בבקשות הבאות
+                self.extra_pages[user_id] = MAX_EXTRA_PAGES
+                break
+        return []
+    
+    async def build_recommendations(self, analysis, user_id, first_candidate=None):
+        """איסוף, הסרת כפילויות ודירוג של כל המועמדים, ושמירתם כרשימת ההמלצות של המשתמש"""
+        try:
+            all_recommendations = await self.gather_candidates(analysis, first_candidate)
+        except Exception as e:
+            print(f"❌ Error gathering recommendations: {e}")
+            all_recommendations = []
         
-        # מחזירים המלצה אחת שעוד לא הוצגה
-        available_recs = self.available_recommendations.get(user_id, [])
-        shown_recs = self.shown_recommendations.get(user_id, [])
+        # הסרת כפילויות בין המקורות - נשאר העותק עם הציון הגבוה, והמטאדטה משולמת מכולם
+        unique_recommendations = merge_duplicates(all_recommendations)
         
-        print(f"📝 Available: {len(available_recs)}, Shown: {len(shown_recs)}")
+        print(f"📊 Total unique recommendations: {len(unique_recommendations)}")
         
-        for rec in available_recs:
-            if rec['name'] not in shown_recs:
-                self.shown_recommendations[user_id].append(rec['name'])
-                print(f"✅ Returning recommendation: {rec['name']}")
-                return [rec]
+        # מיון לפי ציון דמיון במקום ערבוב רנדומלי
+        unique_recommendations.sort(key=lambda rec: rec.similarity_score, reverse=True)
         
-        # אם נגמרו ההמלצות
-        print(f"❌ No more recommendations available for user {user_id}")
-        return []
+        # שמירה עם לוג ציונים
+        print(f"📊 Top recommendations for user {user_id}:")
+        for i, rec in enumerate(unique_recommendations[:5]):
+            print(f"  {i+1}. {rec.name} - Score: {rec.similarity_score}")
+        
+        # שומרים רק אם בינתיים לא התחיל חיפוש חדש למשתמש
+        if self.pending_searches.get(user_id) is asyncio.current_task():
+            # משימת רקע - פותחת את המצב של המשתמש בעצמה (ה-handler שיצר אותה כבר אולי הסתיים)
+            async with self.sessions.session(user_id):
+                self.available_recommendations[user_id] = unique_recommendations
+            del self.pending_searches[user_id]
+    
+    async def rank_pooled(self, analysis, candidates):
+        """הדירוג האישי של מועמדי המאגרים: סינון לפי המשך המדויק וציון מחדש מול הבקשה עצמה
+        (מילות המפתח והמשך של המשתמש - המאגר דורג לפי הנושא בלבד)"""
+        max_duration = analysis.get('duration_max')
+        candidates = [
+            rec for rec in merge_duplicates(candidates)
+            if not (max_duration and rec.duration_minutes and rec.duration_minutes > max_duration)
+        ]
+        scores = await self.scoring_pool.score_podcasts(
+            self.similarity_scorer.calculate_similarity_score, analysis, [rec.podcast for rec in candidates],
+            self.text_similarity
+        )
+        ranked = [Recommendation(rec.podcast, rec.source, score) for rec, score in zip(candidates, scores)]
+        ranked.sort(key=lambda rec: rec.similarity_score, reverse=True)
+        return ranked
+    
+    async def build_pool(self, analysis):
+        """המועמדים למאגר מחושב מראש: אותו איסוף כמו בבקשה רגילה, עם דדליין ארוך יותר"""
+        return await self.gather_candidates(analysis, timeout=POOL_BUILD_DEADLINE)
+    
+    @staticmethod
+    async def wait_for_search(task):
+        """המתנה לדירוג רקע; אם הוא בוטל (נושא חדש / איפוס) ממשיכים עם מה שיש"""
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+    
+    def cancel_pending_search(self, user_id):
+        """ביטול דירוג רקע שעוד רץ עבור המשתמש (נושא חדש / איפוס)"""
+        pending = self.pending_searches.pop(user_id, None)
+        if pending is not None and not pending.done():
+            pending.cancel()
+    
+    async def search_spotify_source(self, query, analysis, offset=0):
+        """חיפוש ב-Spotify כמקור בודד - התוצאות חוזרות עם ציון דמיון"""
+        spotify_results = await self.spotify.search_podcasts(
+            query=query,
+            max_duration=analysis.get('duration_max'),
+            language_preference=analysis.get('language_preference'),
+            limit=SPOTIFY_RESULTS_LIMIT,
+            offset=offset
+        )
+        # חישוב ציון דמיון לתוצאות Spotify - הרשומה עצמה משותפת, הציון שייך להמלצה
+        scores = await self.scoring_pool.score_podcasts(
+            self.similarity_scorer.calculate_similarity_score, analysis, spotify_results, self.text_similarity
+        )
+        return [Recommendation(podcast, 'spotify', score) for podcast, score in zip(spotify_results, scores)]
+    
+    async def gather_candidates(self, analysis, first_candidate=None, timeout=SEARCH_DEADLINE):
+        """הרצת כל המקורות במקביל (נושאים ב-Spotify, מילות מפתח, דטהסט מקומי) עם דדליין כולל (בשניות).
+        
+        first_candidate (Future) מקבל את המועמד הטוב הראשון שעובר את FIRST_RESULT_THRESHOLD"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        sources = {}
+        topics = analysis.get('topics', [])
+        if topics:
+            print(f"🎵 Searching Spotify for topics: {topics}")
+        for topic in topics:
+            sources[asyncio.create_task(self.search_spotify_source(topic, analysis))] = ('topic', topic)
+        
+        # חיפוש לפי מילות מפתח רץ במקביל, אבל נכנס לתוצאות רק אם הנושאים החזירו מעט
+        if analysis.get('keywords'):
+            print(f"🔍 Searching by keywords: {analysis['keywords']}")
+            query = ' '.join(analysis['keywords'][:2])
+            sources[asyncio.create_task(self.search_spotify_source(query, analysis))] = ('keywords', query)
+        
+        # הדטהסט המקומי הוא עבודת CPU - רץ ב-thread כדי לא לחסום את הלולאה
+        print(f"📁 Searching local dataset...")
+        sources[asyncio.create_task(asyncio.to_thread(self.search_local_dataset, analysis))] = ('local', DATASET_CSV)
+        
+        results = {task: [] for task in sources}
+        pending = set(sources)
+        
+        # מיזוג כל מקור ברגע שהוא חוזר
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                kind, label = sources[task]
+                try:
+                    results[task] = task.result()
+                except Exception as e:
+                    print(f"❌ Error searching {kind} source '{label}': {e}")
+                    continue
+                print(f"   Found {len(results[task])} results from {kind} source '{label}'")
+                
+                # מילות מפתח הן גיבוי - נחשבות להתאמה ראשונה רק כשאין נושאים
+                if first_candidate is not None and not first_candidate.done() and (kind != 'keywords' or not topics):
+                    good = [rec for rec in results[task] if rec.similarity_score >= FIRST_RESULT_THRESHOLD]
+                    if good:
+                        first_candidate.set_result(max(good, key=lambda rec: rec.similarity_score))
+        
+        for task in pending:
+            task.cancel()
+            kind, label = sources[task]
+            print(f"⏱️ {kind} source '{label}' missed the {timeout}s deadline - skipped")
+        
+        # סדר קבוע לפני הסרת כפילויות: נושאים, מילות מפתח (אם צריך), ואז הדטהסט המקומי
+        topic_results = [rec for task, (kind, _) in sources.items() if kind == 'topic' for rec in results[task]]
+        all_recommendations = list(topic_results)
+        if len(topic_results) < 5:
+            all_recommendations.extend(rec for task, (kind, _) in sources.items() if kind == 'keywords' for rec in results[task])
+        all_recommendations.extend(rec for task, (kind, _) in sources.items() if kind == 'local' for rec in results[task])
+        
+        return all_recommendations
     
     def is_new_topic(self, analysis, user_id):
         """בודק אם המשתמש מבקש נושא חדש"""
@@ -805,24 +1034,23 @@ def format_single_recommendation(recommendation, intro_message):
     # השתמש בהקדמה האישית
     text = intro_message + "\n" + "=" * 30 + "\n"
     
-    text += f"\n🎧 **{rec['name']}**\n"
-    text += f"👤 מאת: {rec['publisher']}\n"
+    text += f"\n🎧 **{rec.name}**\n"
+    text += f"👤 מאת: {rec.publisher}\n"
      
     # שפה
-    languages = rec.get('languages', [])
+    languages = rec.languages
     if 'he' in languages or 'iw' in languages:
         text += f"🗣️ שפה: עברית\n"
     elif 'en' in languages:
         text += f"🗣️ שפה: אנגלית\n"
     
     # משך זמן
-    if rec.get('duration_minutes'):
-        text += f"⏱️ משך: {rec['duration_minutes']} דקות\n"
+    if rec.duration_minutes:
+        text += f"⏱️ משך: {rec.duration_minutes} דקות\n"
     
     # תיאור
-    description = rec['description'][:200] + "..." if len(rec['description']) > 200 else rec['description']
-    text += f"📝 {description}\n"
-    text += f"🔗 [להאזנה]({rec['url']})\n"
+    text += f"📝 {preview(rec.description)}\n"
+    text += f"🔗 [להאזנה]({rec.url})\n"
     
     text += "\n" + "=" * 30 + "\n"
     text += "💡 רוצה עוד המלצה? פשוט תכתוב 'עוד' או 'עוד המלצה'\n"
@@ -832,6 +1060,17 @@ def format_single_recommendation(recommendation, intro_message):
     return text
 
 # Telegram Bot Functions
+def with_session(handler):
+    """טעינת מצב השיחה של המשתמש לפני ה-handler ושמירתו אחריו (במאגר חיצוני - בלי לחסום את הלולאה)"""
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        bot_instance = context.bot_data.get('bot_instance')
+        if bot_instance is None or update.effective_user is None:
+            return await handler(update, context)
+        async with bot_instance.sessions.session(update.effective_user.id):
+            return await handler(update, context)
+    return wrapper
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     welcome_message = """🎧 היי! אני SHMALI - הבוט שלך להמלצות פודקאסטים!
 
@@ -852,12 +1091,12 @@ async def reset(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """איפוס השיחה"""
     user_id = update.effective_user.id
     bot_instance = context.bot_data['bot_instance']
+    bot_instance.cancel_pending_search(user_id)
     if user_id in bot_instance.gpt_analyzer.conversation_history:
         del bot_instance.gpt_analyzer.conversation_history[user_id]
-    if user_id in bot_instance.shown_recommendations:
-        del bot_instance.shown_recommendations[user_id]
-    if user_id in bot_instance.available_recommendations:
-        del bot_instance.available_recommendations[user_id]
+    for state in (bot_instance.shown_recommendations, bot_instance.available_recommendations,
+                  bot_instance.cursors, bot_instance.extra_pages):
+        state.pop(user_id, None)
 
     welcome_message = """🎧 היי! אני SHMALI - הבוט שלך להמלצות פודקאסטים!
 
@@ -881,7 +1120,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     bot_instance = context.bot_data['bot_instance']
     
     # בדיקה אם המשתמש מבקש עוד המלצות
-    is_more_request = any(word in user_text.lower() for word in ['עוד', 'המלצה נוספת', 'עוד המלצה', 'הבא', 'next'])
+    is_more_request = 'more_request' in bot_instance.gpt_analyzer.phrases.match(user_text.lower())
     
     # אם מבקשים עוד והיה ניתוח קודם
     if is_more_request and user_id in bot_instance.gpt_analyzer.conversation_history:
@@ -926,7 +1165,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # קבלת המלצה אחת
+        started = time.perf_counter()
         recommendation = await bot_instance.get_recommendations(analysis, user_id)
+        print(f"⏱️ Time to recommendation for user {user_id}: {time.perf_counter() - started:.2f}s")
         
         # יצירת הקדמה אישית על בסיס הניתוח
         intro_message = create_personalized_intro(analysis, is_more_request)
@@ -948,20 +1189,78 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "😅 משהו השתבש. תנסה שוב?"
         )
 
+async def close_connections(application):
+    """סגירת חיבורי ה-HTTP המשותפים בסיום"""
+    bot_instance = application.bot_data.get('bot_instance')
+    if bot_instance:
+        bot_instance.catalog_reloader.stop()
+        await bot_instance.spotify.client.aclose()
+        print(f"📡 Spotify scheduler: {bot_instance.spotify.client.stats()}")
+        print(f"🧠 Analysis paths: {bot_instance.gpt_analyzer.analysis_stats}")
+        print(f"💾 Analysis cache: {await asyncio.to_thread(bot_instance.gpt_analyzer.cache.stats)}")
+        print(f"🧮 Scoring pool: {bot_instance.scoring_pool.stats()}")
+        bot_instance.scoring_pool.close()
+        if bot_instance.pools is not None:
+            print(f"🏊 Recommendation pools: {bot_instance.pools.stats()}")
+            bot_instance.pools.close()
+    print(f"📬 Update queue: {application.update_processor.stats()}")
+
+async def report_startup(application):
+    """נקרא רגע לפני שה-poller / ה-webhook מתחיל לקבל הודעות - ומפעיל את רענון מאגרי ההמלצות ברקע"""
+    record_startup_phase('ready', STARTUP_STARTED)
+    print(f"⏱️ Startup phases: {STARTUP_PHASES}")
+    bot_instance = application.bot_data.get('bot_instance')
+    if bot_instance and bot_instance.pools is not None:
+        bot_instance.pools.start(bot_instance.build_pool if bot_instance.build_pools else None)
+
+def build_application(bot, updater=True):
+    """אפליקציית טלגרם עם ה-handlers של הבוט. updater=False - העדכונים מוזנים מבחוץ (worker)"""
+    from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+    from update_processor import ChatOrderedUpdateProcessor
+    
+    # עדכונים מצ'אטים שונים מטופלים במקביל; הודעות מאותו צ'אט - לפי הסדר
+    builder = ApplicationBuilder().token(TELEGRAM_TOKEN).concurrent_updates(ChatOrderedUpdateProcessor())
+    if not updater:
+        builder = builder.updater(None)
+    app = builder.post_init(report_startup).post_shutdown(close_connections).build()
+    app.bot_data["bot_instance"] = bot
+    
+    # הוספת handlers
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("reset", with_session(reset)))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, with_session(handle_message)))
+    return app
+
+def run_updates(app):
+    """קבלת עדכונים לפי BOT_MODE (חוסם עד העצירה)"""
+    if BOT_MODE == 'webhook':
+        # דורש python-telegram-bot[webhooks]
+        app.run_webhook(listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, url_path=WEBHOOK_PATH,
+                        webhook_url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+    else:
+        app.run_polling()
+
 def main():
     # בדיקת הגדרות
     if OPENAI_API_KEY == 'YOUR_OPENAI_API_KEY_HERE':
         print("❌ יש להגדיר את OPENAI_API_KEY!")
         return
     
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    record_startup_phase('imports', STARTUP_STARTED)
+    
+    if WORKER_PROCESSES > 1:
+        from workers import serve
+        serve(WORKER_PROCESSES)
+        return
+    
+    # הבוט (והטעינה ברקע של הקטלוג) קודם - הקטלוג נטען במקביל ל-import של telegram ולחיבור
+    started = time.perf_counter()
     bot = ShmaliBot()
-    app.bot_data["bot_instance"] = bot
+    record_startup_phase('bot_init', started)
     
-    # הוספת handlers
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("reset", reset))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    started = time.perf_counter()
+    app = build_application(bot)
+    record_startup_phase('telegram', started)
     
     print("🚀 SHMALI Bot מתחיל!")
     print("🤖 GPT מופעל עם בדיקת רלוונטיות")
@@ -971,7 +1270,7 @@ def main():
     print("🔄 הגנה מפני בקשות לא רלוונטיות")
     print("🐛 מצב Debug מופעל - תראה לוגים מפורטים")
     
-    app.run_polling()
+    run_updates(app)
 
 if __name__ == '__main__':
     main()
@@ -1,88 +1,744 @@
-import requests
+import asyncio
 import base64
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+import httpx
+from podcast import Podcast, merge_duplicates
+from storage import SQLiteStore
 
 CLIENT_ID = 'CLIENT_ID'
 CLIENT_SECRET = 'CLIENT_SECRET'
 
-# קבלת access token
-def get_access_token():
-    auth_str = f"{CLIENT_ID}:{CLIENT_SECRET}"
-    b64_auth = base64.b64encode(auth_str.encode()).decode()
-
-    response = requests.post(
-        'https://accounts.spotify.com/api/token',
-        headers={
-            'Authorization': f'Basic {b64_auth}'
-        },
-        data={
-            'grant_type': 'client_credentials'
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+API_BASE_URL = 'https://api.spotify.com/v1'
+
+# הגדרות חיבור ל-Spotify
+REQUEST_TIMEOUT = 10  # שניות לכל בקשה
+CONNECT_TIMEOUT = 5
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 30
+MAX_CONCURRENT_REQUESTS = 8  # מספר בקשות מקסימלי שרצות במקביל מול Spotify
+
+# תזמון הבקשות ל-Spotify: token bucket שמאט אחרי 429 וחוזר בהדרגה לקצב המלא.
+# הקצב והפרץ הם התקציב של כל האפליקציה - כשיש כמה תהליכים (workers.py) כל אחד מקבל חלק שווה מהם
+SPOTIFY_RATE_LIMIT = 10.0  # בקשות לשנייה
+SPOTIFY_BURST = 20  # בקשות שיכולות לצאת מיד אחרי תקופה שקטה
+SPOTIFY_MIN_RATE = 1.0  # הקצב לא יורד מתחת לזה גם אחרי הרבה 429 (לכל האפליקציה)
+SPOTIFY_RATE_DECREASE = 0.5  # הקצב מוכפל בזה בכל גל של 429
+SPOTIFY_RATE_RECOVERY = 0.5  # חלק מהקצב המלא שחוזר בכל שנייה בלי 429 (מחצית הקצב - תוך שנייה)
+SPOTIFY_MAX_RETRIES = 2  # ניסיונות חוזרים לבקשה שקיבלה 429 (חוזרת לתור אחרי ה-Retry-After)
+SPOTIFY_DEFAULT_RETRY_AFTER = 1  # שניות, כשה-429 מגיע בלי Retry-After
+SPOTIFY_MAX_RETRY_AFTER = 30  # המתנה ארוכה מזה לא שווה ניסיון חוזר - ה-429 מוחזר לקורא
+WAIT_SAMPLE_SIZE = 1000  # כמה זמני המתנה אחרונים בתור נשמרים לכל עדיפות
+
+# עדיפויות: בקשות של משתמש שמחכה לתשובה יוצאות לפני עבודת רקע (רענון טרנדים, מאגרים מחושבים מראש)
+PRIORITY_USER = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_USER: 'user', PRIORITY_BACKGROUND: 'background'}
+
+# רענון access token
+TOKEN_REFRESH_MARGIN = 120  # שניות לפני תום התוקף שבהן כבר מרעננים ברקע
+TOKEN_MAX_RETRIES = 3
+TOKEN_BACKOFF_BASE = 0.5  # שניות, מוכפל בכל ניסיון
+TOKEN_MAX_BACKOFF = 10
+
+# מטמון מטאדטה של תוכניות (נשמר בדיסק בין הפעלות)
+SHOW_CACHE_PATH = 'show_cache.sqlite3'
+SHOW_CACHE_MAX_SHOWS = 5000
+SHOW_FIELD_TTLS = {  # תוקף בשניות לכל שדה - משך פרק מתיישן מהר יותר מתיאור
+    'name': 7 * 24 * 3600,
+    'publisher': 7 * 24 * 3600,
+    'description': 3 * 24 * 3600,
+    'languages': 7 * 24 * 3600,
+    'total_episodes': 24 * 3600,
+    'duration_minutes': 6 * 3600,
+}
+
+# מטמון תשובות חיפוש בזיכרון
+SEARCH_CACHE_TTL = 15 * 60  # שניות
+SEARCH_CACHE_MAX_ENTRIES = 2000
+SEARCH_CACHE_MAX_BYTES = 32 * 1024 * 1024  # לפי גודל גוף התשובה מ-Spotify
+
+
+class SpotifyError(Exception):
+    """תשובת שגיאה מ-Spotify"""
+
+    def __init__(self, message, status_code, text):
+        super().__init__(message, text)
+        self.status_code = status_code
+        self.text = text
+
+
+# מונה הבקשות הפעיל בהקשר הנוכחי (משימות שנוצרות ממנו יורשות אותו)
+_active_round_trips = contextvars.ContextVar('spotify_round_trips', default=None)
+
+
+class RoundTripCounter:
+    """סופר את הבקשות שיצאו בפועל ל-Spotify בתוך בלוק with"""
+
+    def __init__(self):
+        self.count = 0
+        self._token = None
+
+    def __enter__(self):
+        self._token = _active_round_trips.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_round_trips.reset(self._token)
+
+
+# העדיפות של הבקשות בהקשר הנוכחי (משימות שנוצרות ממנו יורשות אותה)
+_request_priority = contextvars.ContextVar('spotify_request_priority', default=PRIORITY_USER)
+
+
+class RequestPriority:
+    """עדיפות הבקשות ל-Spotify בתוך בלוק with"""
+
+    def __init__(self, priority):
+        self.priority = priority
+        self._token = None
+
+    def __enter__(self):
+        self._token = _request_priority.set(self.priority)
+        return self
+
+    def __exit__(self, *exc_info):
+        _request_priority.reset(self._token)
+
+
+def _retry_after(response):
+    """שניות ההמתנה מכותרת Retry-After של תשובת 429"""
+    try:
+        return max(float(response.headers.get('Retry-After')), 0.0)
+    except (TypeError, ValueError):
+        return SPOTIFY_DEFAULT_RETRY_AFTER
+
+
+class RequestScheduler:
+    """תזמון כל הבקשות ל-Spotify: token bucket שנעצר ל-Retry-After ומוריד את הקצב פעם אחת לכל גל של 429,
+    וחוזר לקצב המלא לפי הזמן שעבר בלי 429; ותור עדיפויות - כשאין token פנוי, בקשת משתמש יוצאת
+    לפני עבודת רקע. זמן ההמתנה בתור נמדד לכל עדיפות.
+
+    processes - כמה תהליכים חולקים את התקציב; לכל אחד חלק שווה מהקצב ומהפרץ"""
+
+    def __init__(self, rate=SPOTIFY_RATE_LIMIT, burst=SPOTIFY_BURST, min_rate=SPOTIFY_MIN_RATE, processes=1):
+        self.max_rate = rate / processes
+        self.rate = self.max_rate
+        self.burst = max(burst / processes, 1.0)
+        self.min_rate = min(min_rate / processes, self.max_rate)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = float('-inf')  # הבקשות שיצאו לפני ההורדה האחרונה לא מורידות שוב
+        self._recovered = 0.0  # עד מתי הקצב כבר הועלה
+        self._waiters = []  # heap של (עדיפות, סדר הגעה, future)
+        self._sequence = itertools.count()
+        self._dispatcher = None
+        self._loop = None
+        self.throttled = 0
+        self._requests = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLE_SIZE) for priority in PRIORITY_NAMES}
+        self._max_wait = dict.fromkeys(PRIORITY_NAMES, 0.0)
+
+    def _refill(self, now):
+        # בזמן עצירה _updated נמצא בעתיד - ה-tokens מצטברים רק מסוף העצירה
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def _take(self):
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._refill(now)
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _delay(self):
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        return max((1 - self._tokens) / self.rate, 0.001)
+
+    def _bind_loop(self):
+        # ממתינים ומשימת החלוקה שייכים ללולאה; מצב הקצב נשמר גם כשהלולאה מתחלפת
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._waiters = []
+            self._dispatcher = None
+            self._loop = loop
+        return loop
+
+    async def acquire(self, priority=PRIORITY_USER):
+        """המתנה ל-token; כשיש תור, יוצאים לפי עדיפות ואז לפי סדר ההגעה"""
+        loop = self._bind_loop()
+        enqueued = time.monotonic()
+        if not self._waiters and self._take():
+            self._record(priority, 0.0)
+            return
+
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        try:
+            await future
+        except asyncio.CancelledError:
+            # בוטל אחרי שכבר קיבל token - מחזירים אותו לבקשה הבאה
+            if future.done() and not future.cancelled():
+                self._tokens = min(self.burst, self._tokens + 1)
+            raise
+        self._record(priority, time.monotonic() - enqueued)
+
+    async def _dispatch(self):
+        while True:
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                break
+            if self._take():
+                heapq.heappop(self._waiters)[2].set_result(None)
+            else:
+                await asyncio.sleep(self._delay())
+        self._dispatcher = None
+
+    def throttle(self, retry_after, sent_at=None):
+        """429: כל הבקשות נעצרות ל-retry_after שניות. הקצב יורד פעם אחת לכל גל: לא בתוך העצירה,
+        ולא בגלל בקשה שיצאה (sent_at) לפני ההורדה הקודמת - היא נשלחה עוד בקצב הישן"""
+        self.throttled += 1
+        now = time.monotonic()
+        self._refill(now)
+        if now >= self._paused_until and (sent_at is None or sent_at >= self._decreased_at):
+            self.rate = max(self.min_rate, self.rate * SPOTIFY_RATE_DECREASE)
+            self._decreased_at = now
+        self._paused_until = max(self._paused_until, now + retry_after)
+        # ה-tokens שנשארו נשמרים; בזמן העצירה הם רק לא מצטברים, וההתאוששות מתחילה בסופה
+        self._updated = max(self._updated, self._paused_until)
+        self._recovered = max(self._recovered, self._paused_until)
+
+    def succeeded(self):
+        """תשובה תקינה: הקצב עולה לפי הזמן שעבר מאז ההתאמה האחרונה (ולא לפי מספר התשובות)"""
+        now = time.monotonic()
+        if self.rate < self.max_rate and now > self._recovered:
+            self._refill(now)
+            elapsed = now - self._recovered
+            self.rate = min(self.max_rate, self.rate + self.max_rate * SPOTIFY_RATE_RECOVERY * elapsed)
+        self._recovered = max(self._recovered, now)
+
+    def _record(self, priority, wait):
+        self._requests[priority] = self._requests.get(priority, 0) + 1
+        self._waits.setdefault(priority, deque(maxlen=WAIT_SAMPLE_SIZE)).append(wait)
+        self._max_wait[priority] = max(self._max_wait.get(priority, 0.0), wait)
+
+    def stats(self):
+        stats = {
+            'rate': round(self.rate, 2),
+            'queued': sum(not future.done() for _, _, future in self._waiters),
+            'throttled': self.throttled,
         }
-    )
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(self._waits[priority])
+            stats[name] = {
+                'requests': self._requests[priority],
+                'avg_wait': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'p95_wait': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                'max_wait': round(self._max_wait[priority], 3),
+            }
+        return stats
 
-    if response.status_code != 200:
-        raise Exception("Failed to get access token", response.text)
 
-    return response.json()['access_token']
+class SpotifyClient:
+    """לקוח HTTP אסינכרוני ל-Spotify - חיבורי keep-alive משותפים, timeout לכל בקשה, הגבלת מקביליות,
+    ותזמון כל הבקשות דרך RequestScheduler (בקשה שקיבלה 429 נשלחת שוב אחרי ה-Retry-After)"""
 
-# קבלת פרק ראשון של פודקאסט לפי show_id
-def get_first_episode_duration(show_id, token):
-    url = f"https://api.spotify.com/v1/shows/{show_id}/episodes?limit=1"
-    headers = {'Authorization': f'Bearer {token}'}
-    response = requests.get(url, headers=headers)
+    def __init__(self, max_concurrency=MAX_CONCURRENT_REQUESTS, timeout=REQUEST_TIMEOUT, scheduler=None, processes=1):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.scheduler = scheduler or RequestScheduler(processes=processes)
+        self.retries = 0
+        self._http = None
+        self._semaphore = None
+        self._loop = None
 
-    if response.status_code != 200:
-        return None
+    def _session(self):
+        """יצירת ה-pool בלולאה הנוכחית (או יצירה מחדש אם הלולאה התחלפה)"""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._loop is not loop:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._http
 
-    items = response.json().get('items', [])
-    if not items:
-        return None
+    async def request(self, method, url, timeout=None, **kwargs):
+        """שליחת בקשה דרך ה-pool המשותף בעדיפות של ההקשר; timeout אופציונלי דורס את ברירת המחדל.
+        429 מוחזר לקורא רק אחרי SPOTIFY_MAX_RETRIES ניסיונות חוזרים"""
+        http = self._session()
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        priority = _request_priority.get()
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(priority)
+            counter = _active_round_trips.get()
+            if counter is not None:
+                counter.count += 1
+            async with self._semaphore:
+                sent_at = time.monotonic()
+                response = await http.request(method, url, **kwargs)
+            if response.status_code != 429:
+                self.scheduler.succeeded()
+                return response
 
-    # משך הפרק במילישניות
-    duration_ms = items[0].get('duration_ms', 0)
-    return duration_ms / 60000  # לדקות
+            retry_after = _retry_after(response)
+            self.scheduler.throttle(retry_after, sent_at)
+            if attempt == SPOTIFY_MAX_RETRIES or retry_after > SPOTIFY_MAX_RETRY_AFTER:
+                return response
+            attempt += 1
+            self.retries += 1
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    def stats(self):
+        return {**self.scheduler.stats(), 'retries': self.retries}
+
+    async def aclose(self):
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+
+_shared_client = None
+
+
+def get_client(processes=None):
+    """הלקוח המשותף לכל הקריאות ל-Spotify בתהליך. processes - כמה תהליכים חולקים את מגבלת הקצב
+    (קובע רק בקריאה הראשונה)"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = SpotifyClient(processes=processes or 1)
+    return _shared_client
+
+class ShowMetadataCache:
+    """מטמון מטאדטה לפי מזהה תוכנית ב-Spotify - תוקף נפרד לכל שדה ופינוי LRU.
+    המתודות חוסמות (SQLite) - מקוד אסינכרוני קוראים להן דרך asyncio.to_thread"""
+
+    def __init__(self, path=SHOW_CACHE_PATH, max_shows=SHOW_CACHE_MAX_SHOWS, field_ttls=None):
+        self.field_ttls = field_ttls or SHOW_FIELD_TTLS
+        self.store = SQLiteStore(path, table='shows', max_entries=max_shows)
+
+    def get_many(self, show_ids):
+        """מחזיר מילון show_id -> {שדה: ערך} עם השדות שעדיין בתוקף בלבד"""
+        now = time.time()
+        fresh = {}
+        for show_id, (entry, _) in self.store.get_many(show_ids).items():
+            fields = {
+                field: value for field, (value, fetched_at) in entry.items()
+                if now - fetched_at < self.field_ttls.get(field, 0)
+            }
+            if fields:
+                fresh[show_id] = fields
+        return fresh
+
+    def get(self, show_id):
+        return self.get_many([show_id]).get(show_id, {})
+
+    def update_many(self, updates):
+        """מיזוג שדות חדשים (show_id -> {שדה: ערך}) לרשומות הקיימות"""
+        updates = {show_id: fields for show_id, fields in updates.items() if fields}
+        if not updates:
+            return
+        now = time.time()
+        existing = self.store.get_many(updates.keys())
+        merged = {}
+        for show_id, fields in updates.items():
+            entry = existing[show_id][0] if show_id in existing else {}
+            for field, value in fields.items():
+                entry[field] = [value, now]
+            merged[show_id] = entry
+        self.store.set_many(merged)
+
+    def remember_shows(self, shows):
+        """שמירת המטאדטה מתשובת חיפוש, והשלמת שדות חסרים בתוכניות מהמטמון"""
+        shows = [show for show in shows if show and show.get('id')]
+        cached = self.get_many([show['id'] for show in shows])
+        updates = {}
+        for show in shows:
+            fields = {}
+            for field in self.field_ttls:
+                if field == 'duration_minutes':
+                    continue
+                if show.get(field) in (None, '', []):
+                    if field in cached.get(show['id'], {}):
+                        show[field] = cached[show['id']][field]
+                else:
+                    fields[field] = show[field]
+            updates[show['id']] = fields
+        self.update_many(updates)
+        return shows
+
+    def close(self):
+        self.store.close()
+
+
+class SearchCache:
+    """מטמון תשובות /search בזיכרון לפי (query, type, market, limit) - TTL, גודל חסום,
+    ובקשה אחת בלבד ל-Spotify כשכמה משתמשים מבקשים את אותו מפתח בו-זמנית"""
+
+    def __init__(self, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES, max_bytes=SEARCH_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, items)
+        self._inflight = {}  # key -> (משימה, העדיפות שבה נשלחה)
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get_or_fetch(self, key, fetch):
+        """מחזיר את התוצאה מהמטמון, או מריץ fetch() (שמחזיר (items, size)) פעם אחת לכל המחכים"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self._drop(key)
+
+        # בקשת משתמש לא מצטרפת לבקשת רקע שממתינה בתור מאחורי בקשות של משתמשים
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[1] <= _request_priority.get():
+            task = inflight[0]
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = (task, _request_priority.get())
+            task.add_done_callback(lambda done: self._complete(key, done))
+
+        # shield - ביטול של מבקש אחד לא מבטל את הבקשה המשותפת לשאר
+        items, _ = await asyncio.shield(task)
+        return items
+
+    def _complete(self, key, task):
+        if self._inflight.get(key, (None,))[0] is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        items, size = task.result()
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, items)
+        self.bytes_used += size
+        while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes_used -= size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes_used,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
+
+
+_search_cache = None
+
+
+def get_search_cache():
+    """מטמון החיפושים המשותף לתהליך"""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache()
+    return _search_cache
+
+_show_cache = None
+
+
+def get_show_cache():
+    """מטמון המטאדטה המשותף לתהליך"""
+    global _show_cache
+    if _show_cache is None:
+        _show_cache = ShowMetadataCache()
+    return _show_cache
+
+class SpotifyTokenManager:
+    """access token משותף לכל הקריאות - רענון לפני תום התוקף, רענון אחד בלבד גם כשהרבה בקשות
+    צריכות token באותו רגע, וניסיונות חוזרים עם backoff על שגיאות רשת ו-5xx.
+    429 נוסה שוב כבר ב-SpotifyClient (אחרי ה-Retry-After, דרך ה-scheduler) - כאן הוא סופי"""
+
+    def __init__(self, client_id, client_secret, client=None, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.client = client or get_client()
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = 0.0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._refreshing = {}  # לולאה -> משימת הרענון שרצה בה
+
+    async def get_token(self):
+        """token בתוקף; מעלה SpotifyError אם הרענון נכשל סופית"""
+        with self._lock:
+            token, expires_at = self.token, self.expires_at
+        now = time.monotonic()
+        if token and now < expires_at - self.refresh_margin:
+            return token
+
+        refresh = self._start_refresh()
+        # עדיין בתוקף - הרענון ממשיך ברקע והבקשה לא מחכה לו
+        if token and now < expires_at:
+            return token
+        return await asyncio.shield(refresh)
+
+    def _start_refresh(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._refreshing.get(loop)
+            if task is None or task.done():
+                task = loop.create_task(self._refresh())
+                task.add_done_callback(self._log_failure)
+                self._refreshing = {loop: task}
+            return task
+
+    @staticmethod
+    def _log_failure(task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error refreshing Spotify token: {task.exception()}")
+
+    async def _refresh(self):
+        # כל בקשות המשתמשים תלויות ב-token - גם רענון שהתחיל מעבודת רקע יוצא בעדיפות משתמש
+        with RequestPriority(PRIORITY_USER):
+            return await self._request_token()
+
+    async def _request_token(self):
+        auth_str = f"{self.client_id}:{self.client_secret}"
+        b64_auth = base64.b64encode(auth_str.encode()).decode()
+
+        for attempt in range(TOKEN_MAX_RETRIES + 1):
+            try:
+                response = await self.client.post(
+                    TOKEN_URL,
+                    headers={'Authorization': f'Basic {b64_auth}'},
+                    data={'grant_type': 'client_credentials'}
+                )
+            except httpx.HTTPError as e:
+                error = SpotifyError("Failed to get access token", None, str(e))
+            else:
+                if response.status_code == 200:
+                    data = response.json()
+                    with self._lock:
+                        self.token = data['access_token']
+                        self.expires_at = time.monotonic() + data.get('expires_in', 3600)
+                        self.refreshes += 1
+                    return data['access_token']
+
+                error = SpotifyError("Failed to get access token", response.status_code, response.text)
+                # 4xx (פרטי גישה שגויים, או 429 שהלקוח כבר ניסה שוב) לא יעברו בניסיון חוזר נוסף
+                if response.status_code < 500:
+                    raise error
+
+            if attempt == TOKEN_MAX_RETRIES:
+                raise error
+            await asyncio.sleep(min(TOKEN_BACKOFF_BASE * (2 ** attempt), TOKEN_MAX_BACKOFF))
+
+
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+
+def get_token_manager(client_id=CLIENT_ID, client_secret=CLIENT_SECRET):
+    """מנהל ה-token המשותף לפרטי הגישה האלה (אחד לכל התהליך)"""
+    with _token_managers_lock:
+        key = (client_id, client_secret)
+        if key not in _token_managers:
+            _token_managers[key] = SpotifyTokenManager(client_id, client_secret)
+        return _token_managers[key]
+
+# קבלת access token (דרך מנהל ה-token המשותף - בלי בקשה חדשה בכל קריאה)
+async def get_access_token():
+    return await get_token_manager().get_token()
+
+# בקשות /episodes שכבר בדרך, לפי מזהה תוכנית: show_id -> (משימה, העדיפות שבה נשלחה).
+# חיפושים במקביל שמחזירים את אותן תוכניות מחכים לאותה בקשה במקום לשלוח עוד אחת
+_inflight_durations = {}
+
+
+def _forget_duration_fetch(show_id, task):
+    if _inflight_durations.get(show_id, (None,))[0] is task:
+        del _inflight_durations[show_id]
+
+
+# קבלת משך הפרק האחרון לקבוצת תוכניות בסבב אחד
+# ל-Spotify אין endpoint מרובה-מזהים שמחזיר פרקים של כמה תוכניות (/shows?ids= מחזיר תוכניות מקוצרות
+# ללא פרקים), לכן נשלחת בקשה אחת לכל תוכנית ייחודית שאין לה כבר בקשה בדרך - כולן במקביל דרך ה-pool המשותף
+async def fetch_latest_episode_durations(show_ids, token, client=None):
+    """מחזיר (מילון show_id -> duration_ms או None, מספר הבקשות שנשלחו)"""
+    client = client or get_client()
+    unique_ids = list(dict.fromkeys(show_ids))
+    if not unique_ids:
+        return {}, 0
 
-# חיפוש פודקאסטים לפי קטגוריה וסינון לפי משך פרק ראשון
-def search_podcasts_by_category(category, max_duration_minutes=None, limit=10):
-    token = get_access_token()
     headers = {'Authorization': f'Bearer {token}'}
 
+    async def fetch(show_id):
+        try:
+            response = await client.get(
+                f"{API_BASE_URL}/shows/{show_id}/episodes",
+                headers=headers,
+                params={'limit': 1}
+            )
+            if response.status_code != 200:
+                return None
+            items = response.json().get('items', [])
+        except (httpx.HTTPError, ValueError):
+            return None
+
+        if not items or not items[0]:
+            return None
+        return items[0].get('duration_ms', 0)
+
+    loop = asyncio.get_running_loop()
+    priority = _request_priority.get()
+    tasks = []
+    sent = 0
+    for show_id in unique_ids:
+        inflight = _inflight_durations.get(show_id)
+        # כמו במטמון החיפושים: בקשת משתמש לא מצטרפת לבקשת רקע (וגם לא למשימה מלולאה אחרת)
+        if inflight is not None and inflight[0].get_loop() is loop and inflight[1] <= priority:
+            task = inflight[0]
+        else:
+            task = loop.create_task(fetch(show_id))
+            _inflight_durations[show_id] = (task, priority)
+            task.add_done_callback(lambda done, show_id=show_id: _forget_duration_fetch(show_id, done))
+            sent += 1
+        tasks.append(task)
+
+    # shield - ביטול של מבקש אחד לא מבטל את הבקשה המשותפת לשאר
+    durations = await asyncio.gather(*(asyncio.shield(task) for task in tasks))
+    return dict(zip(unique_ids, durations)), sent
+
+# חיפוש תוכניות דרך מטמון החיפושים - זהה לכל הקוראים (SpotifyAPI והפונקציות במודול)
+async def search_shows(query, token, limit=10, market=None, client=None, cache=None, show_cache=None, offset=0):
+    """מחזיר את רשימת התוכניות לשאילתה (מהמקום offset בתוצאות); מעלה SpotifyError אם החיפוש נכשל"""
+    client = client or get_client()
+    cache = cache or get_search_cache()
+    show_cache = show_cache or get_show_cache()
+
+    params = {'q': query, 'type': 'show', 'limit': limit}
+    if market:
+        params['market'] = market
+    if offset:
+        params['offset'] = offset
+
+    async def fetch():
+        response = await client.get(
+            f'{API_BASE_URL}/search',
+            headers={'Authorization': f'Bearer {token}'},
+            params=params
+        )
+        if response.status_code != 200:
+            raise SpotifyError("Search failed", response.status_code, response.text)
+        # SQLite חוסם - הקריאה והכתיבה של כל התשובה יחד ב-thread, לא בלולאת האירועים
+        shows = await asyncio.to_thread(show_cache.remember_shows, response.json().get('shows', {}).get('items', []))
+        return shows, len(response.content)
+
+    return await cache.get_or_fetch((query, 'show', market, limit, offset), fetch)
+
+# משכי הפרק האחרון (בדקות) דרך המטמון - רק תוכניות שאין להן משך בתוקף נשלחות ל-Spotify
+async def resolve_episode_durations(show_ids, token, client=None, cache=None, fetch_missing=True):
+    """מחזיר (מילון show_id -> דקות או None, מספר הבקשות שנשלחו)"""
+    cache = cache or get_show_cache()
+    show_ids = list(dict.fromkeys(show_ids))
+    cached = await asyncio.to_thread(cache.get_many, show_ids)
+    durations = {
+        show_id: cached[show_id]['duration_minutes']
+        for show_id in show_ids if 'duration_minutes' in cached.get(show_id, {})
+    }
+    if not fetch_missing:
+        return durations, 0
+
+    missing = [show_id for show_id in show_ids if show_id not in durations]
+    fetched, round_trips = await fetch_latest_episode_durations(missing, token, client=client)
+    for show_id, duration_ms in fetched.items():
+        durations[show_id] = duration_ms / 60000 if duration_ms is not None else None
+
+    # כשלונות לא נשמרים, כדי שלא ייתקעו במטמון עד תום התוקף
+    await asyncio.to_thread(cache.update_many, {
+        show_id: {'duration_minutes': durations[show_id]}
+        for show_id, duration_ms in fetched.items() if duration_ms is not None
+    })
+    return durations, round_trips
+
+# חיפוש פודקאסטים לפי קטגוריה וסינון לפי משך פרק ראשון
+async def search_podcasts_by_category(category, max_duration_minutes=None, limit=10):
     query = f'{category} podcast'
-    response = requests.get(
-        'https://api.spotify.com/v1/search',
-        headers=headers,
-        params={
-            'q': query,
-            'type': 'show',
-            'limit': limit
-        }
-    )
 
-    if response.status_code != 200:
-        raise Exception("Search failed", response.text)
+    with RoundTripCounter() as round_trips:
+        token = await get_access_token()
+        shows = await search_shows(query, token, limit=limit)
+
+        # משכי הפרקים נפתרים יחד לכל התוצאות, ורק אם יש הגבלת משך
+        durations = {}
+        if max_duration_minutes is not None:
+            durations, _ = await resolve_episode_durations([show['id'] for show in shows], token)
+    print(f"📡 Spotify round trips for '{query}': {round_trips.count}")
 
-    shows = response.json().get('shows', {}).get('items', [])
     filtered = []
 
     for show in shows:
         if max_duration_minutes is not None:
-            episode_duration = get_first_episode_duration(show['id'], token)
+            episode_duration = durations.get(show['id'])
             if episode_duration is None or episode_duration > max_duration_minutes:
                 continue
 
-        filtered.append({
-            'name': show['name'],
-            'publisher': show['publisher'],
-            'description': show['description'],
-            'url': show['external_urls']['spotify'],
-            'language': show.get('languages', [''])[0],
-        })
+        filtered.append(Podcast.from_spotify(show, durations.get(show['id']), description_length=None))
 
     return filtered
 
-# קבלת פודקאסטים פופולריים (trending) - ללא פרמטר token
-def get_popular_podcasts(limit=3):
-    token = get_access_token()
-    headers = {'Authorization': f'Bearer {token}'}
+# קבלת פודקאסטים פופולריים (trending) - ללא פרמטר token; עבודת רקע, מפנה את התור לבקשות משתמשים
+async def get_popular_podcasts(limit=3):
+    with RequestPriority(PRIORITY_BACKGROUND):
+        return await _popular_podcasts(limit)
+
+async def _popular_podcasts(limit):
+    token = await get_access_token()
     
     # נסיון למצוא פודקאסטים פופולריים עם מילות מפתח שונות
     popular_queries = [
@@ -96,38 +752,25 @@ def get_popular_podcasts(limit=3):
     all_podcasts = []
     
     for query in popular_queries:
-        response = requests.get(
-            'https://api.spotify.com/v1/search',
-            headers=headers,
-            params={
-                'q': query,
-                'type': 'show',
-                'market': 'IL',  # שוק ישראלי
-                'limit': 10
-            }
-        )
+        try:
+            shows = await search_shows(query, token, limit=10, market='IL')  # שוק ישראלי
+        except SpotifyError as e:
+            print(f"⚠️ Spotify search failed for '{query}' ({e.status_code})")
+            continue
 
-        if response.status_code == 200:
-            shows = response.json().get('shows', {}).get('items', [])
-            for show in shows:
-                # נוסיף רק פודקאסטים שעדיין לא קיימים ברשימה
-                if not any(p['name'] == show['name'] for p in all_podcasts):
-                    all_podcasts.append({
-                        'name': show['name'],
-                        'publisher': show['publisher'],
-                        'description': show['description'][:300] + "..." if len(show['description']) > 300 else show['description'],
-                        'url': show['external_urls']['spotify'],
-                        'language': show.get('languages', [''])[0] if show.get('languages') else 'unknown',
-                        'total_episodes': show.get('total_episodes', 0)
-                    })
+        # רשומות נפרדות מהמאגר המשותף - עם אורך התיאור של הרשימה הזו
+        all_podcasts.extend(Podcast.from_spotify(show, description_length=300) for show in shows)
     
-    # נחזיר את הפודקאסטים הראשונים לפי הכמות המבוקשת
-    return all_podcasts[:limit]
+    # נחזיר את הפודקאסטים הראשונים (בלי כפילויות) לפי הכמות המבוקשת
+    return merge_duplicates(all_podcasts)[:limit]
 
-# פונקציה חדשה לקבלת פודקאסטים פופולריים בישראל
-def get_israeli_popular_podcasts(limit=3):
-    token = get_access_token()
-    headers = {'Authorization': f'Bearer {token}'}
+# פונקציה חדשה לקבלת פודקאסטים פופולריים בישראל (עבודת רקע)
+async def get_israeli_popular_podcasts(limit=3):
+    with RequestPriority(PRIORITY_BACKGROUND):
+        return await _israeli_popular_podcasts(limit)
+
+async def _israeli_popular_podcasts(limit):
+    token = await get_access_token()
     
     israeli_queries = [
         'פודקאסט',
@@ -140,27 +783,12 @@ def get_israeli_popular_podcasts(limit=3):
     all_podcasts = []
     
     for query in israeli_queries:
-        response = requests.get(
-            'https://api.spotify.com/v1/search',
-            headers=headers,
-            params={
-                'q': query,
-                'type': 'show',
-                'market': 'IL',
-                'limit': 15
-            }
-        )
+        try:
+            shows = await search_shows(query, token, limit=15, market='IL')
+        except SpotifyError as e:
+            print(f"⚠️ Spotify search failed for '{query}' ({e.status_code})")
+            continue
 
-        if response.status_code == 200:
-            shows = response.json().get('shows', {}).get('items', [])
-            for show in shows:
-                if not any(p['name'] == show['name'] for p in all_podcasts):
-                    all_podcasts.append({
-                        'name': show['name'],
-                        'publisher': show['publisher'],
-                        'description': show['description'][:250] + "..." if len(show['description']) > 250 else show['description'],
-                        'url': show['external_urls']['spotify'],
-                        'total_episodes': show.get('total_episodes', 0)
-                    })
+        all_podcasts.extend(Podcast.from_spotify(show, description_length=250) for show in shows)
     
-    return all_podcasts[:limit]
+    return merge_duplicates(all_podcasts)[:limit]
@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class SQLiteStore:
+    """מאגר key -> JSON על גבי SQLite, עם פינוי LRU כשעוברים את מספר הרשומות המקסימלי"""
+
+    def __init__(self, path, table='entries', max_entries=10000):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL מאפשר קריאות במקביל לכתיבה (גם מכמה תהליכים)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)')
+
+    def get(self, key):
+        """מחזיר (value, updated_at) או None"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """מחזיר מילון key -> (value, updated_at) לכל המפתחות שנמצאו, ומעדכן את זמן הגישה שלהם"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        found = {}
+        now = time.time()
+        with self._lock:
+            # SQLite מגביל את מספר הפרמטרים בשאילתה - עובדים בקבוצות
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT key, value, updated_at FROM {self.table} WHERE key IN ({placeholders})', chunk
+                ).fetchall()
+                for key, value, updated_at in rows:
+                    found[key] = (json.loads(value), updated_at)
+                if rows:
+                    hit_keys = [row[0] for row in rows]
+                    self._conn.execute(
+                        f'UPDATE {self.table} SET accessed_at = ? WHERE key IN ({",".join("?" * len(hit_keys))})',
+                        [now, *hit_keys]
+                    )
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """כתיבת כמה רשומות בטרנזקציה אחת ופינוי הרשומות הישנות ביותר אם צריך"""
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, json.dumps(value, ensure_ascii=False), now, now) for key, value in items.items()]
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    f'INSERT OR REPLACE INTO {self.table} (key, value, updated_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+                self._evict()
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def keys(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f'SELECT key FROM {self.table}')]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table}')
+
+    def _evict(self):
+        """מחיקת הרשומות שלא נגעו בהן הכי הרבה זמן (LRU) מעבר למגבלת הגודל"""
+        if not self.max_entries:
+            return
+        count = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                f'DELETE FROM {self.table} WHERE key IN '
+                f'(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)',
+                (excess,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,173 @@
+import math
+import sys
+import zlib
+from difflib import SequenceMatcher
+import numpy as np
+
+# מנוע דמיון הטקסט הפעיל: 'sequence' (SequenceMatcher, ברירת המחדל) או 'tfidf'
+SIMILARITY_BACKEND = 'sequence'
+
+# הגדרות TF-IDF של n-grams תוויים
+NGRAM_SIZE = 3
+HASH_DIMENSIONS = 2 ** 18
+
+
+class SequenceSimilarity:
+    """דמיון לפי SequenceMatcher - ההתנהגות המקורית"""
+
+    name = 'sequence'
+    vectorized = False
+
+    def similarity(self, text1, text2):
+        return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+
+
+class TfidfSimilarity:
+    """דמיון cosine בין וקטורי TF-IDF של n-grams תוויים.
+
+    ה-n-grams ממופים ב-hashing (crc32 - יציב בין תהליכים) למרחב בגודל קבוע, כך שאין אוצר מילים לשמור.
+    ה-IDF נלמד מהדטהסט המקומי; לפני fit כל המשקלים שווים. כל קטלוג לומד עותק משלו (fitted),
+    והעותק נשלח כמו שהוא לתהליכי ה-scoring pool"""
+
+    name = 'tfidf'
+    vectorized = True
+
+    def __init__(self, ngram_size=NGRAM_SIZE, dimensions=HASH_DIMENSIONS):
+        from scipy import sparse  # תלות אופציונלית - נטענת רק אם בוחרים במנוע הזה
+        self._sparse = sparse
+        self.ngram_size = ngram_size
+        self.dimensions = dimensions
+        self.idf = np.ones(dimensions)
+
+    def _features(self, text):
+        padded = f' {text.lower()} '
+        if len(padded) <= self.ngram_size:
+            grams = [padded]
+        else:
+            grams = [padded[i:i + self.ngram_size] for i in range(len(padded) - self.ngram_size + 1)]
+        counts = {}
+        for gram in grams:
+            feature = zlib.crc32(gram.encode('utf-8')) % self.dimensions
+            counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    def __getstate__(self):
+        # המודול של scipy לא עובר pickle - נטען מחדש בתהליך שמקבל את המנוע
+        state = self.__dict__.copy()
+        del state['_sparse']
+        return state
+
+    def __setstate__(self, state):
+        from scipy import sparse
+        self.__dict__.update(state)
+        self._sparse = sparse
+
+    def fitted(self, texts):
+        """עותק חדש עם IDF שנלמד מהקורפוס - המנוע שעליו נקראה הפונקציה לא משתנה"""
+        return type(self)(self.ngram_size, self.dimensions).fit(texts)
+
+    def fit(self, texts):
+        """לימוד IDF מקורפוס (idf חלק כמו ב-sklearn)"""
+        document_frequency = np.zeros(self.dimensions)
+        documents = 0
+        for text in texts:
+            documents += 1
+            document_frequency[list(self._features(text))] += 1
+        self.idf = np.log((1 + documents) / (1 + document_frequency)) + 1
+        return self
+
+    def transform(self, texts):
+        """מטריצה דלילה (CSR) של וקטורי TF-IDF מנורמלים, שורה לכל טקסט"""
+        data, indices, indptr = [], [], [0]
+        for text in texts:
+            counts = self._features(text)
+            features = np.fromiter(counts, dtype=np.int64, count=len(counts))
+            weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf[features]
+            norm = math.sqrt(float(weights @ weights)) or 1.0
+            indices.extend(features.tolist())
+            data.extend((weights / norm).tolist())
+            indptr.append(len(indices))
+        return self._sparse.csr_matrix(
+            (np.array(data), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, self.dimensions)
+        )
+
+    def similarities(self, query, matrix):
+        """cosine בין השאילתה לכל שורות המטריצה - מכפלה דלילה אחת"""
+        return np.asarray((matrix @ self.transform([query]).T).todense()).ravel()
+
+    def similarity(self, text1, text2):
+        return float(self.similarities(text1, self.transform([text2]))[0])
+
+
+_backends = {}
+
+
+def get_similarity_backend(name=None):
+    """המנוע המשותף לתהליך; אם TF-IDF לא זמין (אין scipy) חוזרים ל-SequenceMatcher"""
+    name = name or SIMILARITY_BACKEND
+    if name not in _backends:
+        if name == 'tfidf':
+            try:
+                _backends[name] = TfidfSimilarity()
+            except ImportError:
+                print("⚠️ scipy לא מותקן - משתמשים ב-SequenceMatcher לדמיון טקסט")
+                _backends[name] = get_similarity_backend('sequence')
+        elif name == 'sequence':
+            _backends[name] = SequenceSimilarity()
+        else:
+            raise ValueError(f"Unknown similarity backend: {name}")
+    return _backends[name]
+
+
+def compare_backends(catalog_df, queries, candidate='tfidf', top_k=10):
+    """השוואת דיוק בין SequenceMatcher למנוע אחר על הדטהסט המקומי.
+
+    מחזיר לכל שאילתה: MAE ומתאם בין ציוני הדמיון הגולמיים, וחפיפה בין ה-top-k הסופיים"""
+    from local_catalog import LocalCatalog
+
+    reference = LocalCatalog(catalog_df, similarity=get_similarity_backend('sequence'))
+    other = LocalCatalog(catalog_df, similarity=get_similarity_backend(candidate))
+    sequence = get_similarity_backend('sequence')
+    sample = np.arange(min(len(reference), 500))
+
+    report = []
+    for query in queries:
+        analysis = {'topics': [query], 'keywords': [], 'language_preference': 'hebrew', 'duration_max': None}
+        text = query.lower()
+
+        # ציוני דמיון גולמיים (שם + תיאור) על מדגם שורות
+        expected = np.array([
+            max(sequence.similarity(text, reference.name_at(i)), sequence.similarity(text, reference.description_at(i)))
+            for i in sample
+        ])
+        actual = other.text_similarities(text, sample) if other.similarity.vectorized else np.array([
+            max(other.similarity.similarity(text, other.name_at(i)), other.similarity.similarity(text, other.description_at(i)))
+            for i in sample
+        ])
+        correlation = float(np.corrcoef(expected, actual)[0, 1]) if expected.std() and actual.std() else 0.0
+
+        expected_top = [row for row, _ in reference.score(analysis, top_k)]
+        actual_top = [row for row, _ in other.score(analysis, top_k)]
+        overlap = len(set(expected_top) & set(actual_top)) / max(len(expected_top), 1)
+
+        report.append({
+            'query': query,
+            'mae': round(float(np.abs(expected - actual).mean()), 4),
+            'correlation': round(correlation, 4),
+            f'top{top_k}_overlap': round(overlap, 3),
+        })
+    return report
+
+
+DEFAULT_COMPARISON_QUERIES = ['ספורט', 'טכנולוגיה', 'בריאות', 'קומדיה', 'חדשות', 'עסקים', 'פסיכולוגיה', 'היסטוריה']
+
+
+if __name__ == '__main__':
+    # שימוש: python text_similarity.py [podcast_dataset.csv] [tfidf]
+    import pandas as pd
+
+    dataset = sys.argv[1] if len(sys.argv) > 1 else 'podcast_dataset.csv'
+    candidate_backend = sys.argv[2] if len(sys.argv) > 2 else 'tfidf'
+    for row in compare_backends(pd.read_csv(dataset), DEFAULT_COMPARISON_QUERIES, candidate=candidate_backend):
+        print(row)
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import deque
+from telegram.ext import BaseUpdateProcessor
+
+UPDATE_CONCURRENCY = 16  # כמה עדכונים (מצ'אטים שונים) מעובדים במקביל
+MAX_PENDING_UPDATES = 1000  # עדכונים שהתקבלו ועוד לא טופלו; מעבר לזה ממתינים בתור של PTB
+MAX_CHAT_PENDING = 20  # הודעות שממתינות בתור של צ'אט אחד; מעבר לזה נזרקות (צ'אט אחד לא ממלא את כל החסם)
+WAIT_SAMPLE_SIZE = 1000  # כמה זמני המתנה אחרונים נשמרים לחישוב האחוזונים
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """עיבוד עדכונים במקביל עד UPDATE_CONCURRENCY, עם סדר לכל צ'אט: הודעה שמגיעה בזמן שהודעה קודמת
+    מאותו צ'אט עדיין בטיפול נכנסת לתור של הצ'אט ומטופלת אחריה - בלי לתפוס מקום של צ'אטים אחרים.
+
+    הסמפור של PTB (max_concurrent_updates) משמש כאן רק כחסם לעדכונים הממתינים: כל עדכון מחזיק בו
+    עד שטופל (גם כשהוא ממתין בתור של הצ'אט). את ההגבלה על הריצה עושים כאן, כדי שזמן ההמתנה ועומק
+    התור יימדדו מרגע ההגעה"""
+
+    def __init__(self, concurrency=UPDATE_CONCURRENCY, max_pending=MAX_PENDING_UPDATES,
+                 max_chat_pending=MAX_CHAT_PENDING):
+        super().__init__(max_pending)
+        self.concurrency = concurrency
+        self.max_chat_pending = max_chat_pending
+        self._slots = asyncio.Semaphore(concurrency)
+        self._chats = {}  # chat_id -> תור (coroutine, זמן הגעה, future) של הודעות שממתינות להודעה שבטיפול
+        self.waiting = 0
+        self.dropped = 0
+        self.max_waiting = 0
+        self.running = 0
+        self.processed = 0
+        self._waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._max_wait = 0.0
+
+    @staticmethod
+    def _chat_id(update):
+        chat = getattr(update, 'effective_chat', None)
+        return chat.id if chat is not None else None
+
+    async def do_process_update(self, update, coroutine):
+        arrived = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+
+        chat_id = self._chat_id(update)
+        if chat_id is not None and chat_id in self._chats:
+            queue = self._chats[chat_id]
+            if len(queue) >= self.max_chat_pending:
+                self.waiting -= 1
+                self.dropped += 1
+                coroutine.close()
+                print(f"⚠️ Dropped update for chat {chat_id} - {len(queue)} updates already queued")
+                return
+            # הצ'אט כבר בטיפול - מי שמטפל בו יריץ גם את זה, לפי הסדר. ממתינים לסיום כדי שהמקום
+            # בסמפור של PTB יישאר תפוס - כך MAX_PENDING_UPDATES חוסם גם את התורים של הצ'אטים
+            done = asyncio.get_running_loop().create_future()
+            queue.append((coroutine, arrived, done))
+            await done
+            return
+
+        queue = deque()
+        if chat_id is not None:
+            self._chats[chat_id] = queue
+        try:
+            async with self._slots:
+                await self._run(coroutine, arrived)
+                while queue:
+                    coroutine, arrived, done = queue.popleft()
+                    try:
+                        await self._run(coroutine, arrived)
+                    finally:
+                        if not done.done():
+                            done.set_result(None)
+        finally:
+            self._chats.pop(chat_id, None)
+
+    async def _run(self, coroutine, arrived):
+        wait = time.perf_counter() - arrived
+        self._waits.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+        self.waiting -= 1
+        self.running += 1
+        try:
+            await coroutine
+        except Exception as e:
+            # PTB מטפל בשגיאות של ה-handlers בעצמו; כאן רק לא לעצור את שאר התור של הצ'אט
+            print(f"❌ Update processing error: {e}")
+        finally:
+            self.running -= 1
+            self.processed += 1
+
+    def stats(self):
+        waits = sorted(self._waits)
+        return {
+            'processed': self.processed,
+            'running': self.running,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'dropped': self.dropped,
+            'avg_wait': round(sum(waits) / len(waits), 3) if waits else 0.0,
+            'p95_wait': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            'max_wait': round(self._max_wait, 3),
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        # הודעות שלא הספיקו להתחיל - סוגרים את ה-coroutines כדי שלא יישארו תלויים
+        for queue in self._chats.values():
+            for coroutine, _, done in queue:
+                coroutine.close()
+                if not done.done():
+                    done.set_result(None)
+        self._chats.clear()
@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from bisect import bisect_right
+from binary_catalog import CATALOG_DIR, build_catalog, load_catalog
+from catalog_reloader import CatalogReloader
+
+# פריסה מרובת תהליכים: תהליך חזית מקבל את העדכונים ומנתב כל משתמש ל-worker קבוע (לפי hash עקבי),
+# וכל worker מחזיק את המצב של המשתמשים שלו. הקטלוג המקומי נבנה פעם אחת בפורמט הבינארי וממופה בכל ה-workers
+WORKER_COUNT = os.cpu_count() or 1
+WORKER_VIRTUAL_NODES = 64  # נקודות לכל worker על הטבעת - פיזור אחיד יותר של המשתמשים
+WORKER_STOP_TIMEOUT = 30  # שניות לסיום הטיפול בעדכונים שכבר הועברו לפני שעוצרים worker בכוח
+BENCH_SECONDS = 5
+
+
+def _hash(value):
+    """hash יציב בין תהליכים והפעלות (בניגוד ל-hash() של פייתון)"""
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """hash עקבי: user_id -> worker. הוספה או הסרה של worker מעבירה רק כ-1/N מהמשתמשים"""
+
+    def __init__(self, nodes, virtual_nodes=WORKER_VIRTUAL_NODES):
+        points = sorted((_hash(f'{node}:{replica}'), node) for node in nodes for replica in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        return self._nodes[bisect_right(self._hashes, _hash(key)) % len(self._hashes)]
+
+
+def run_worker(index, updates, worker_count=1):
+    """תהליך worker: ShmaliBot משלו על הקטלוג המשותף, מקבל עדכונים (JSON) מהחזית דרך התור"""
+    # Ctrl+C מגיע לכל קבוצת התהליכים - העצירה המסודרת עוברת דרך החזית
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_worker(index, updates, worker_count))
+
+
+async def _serve_worker(index, updates, worker_count=1):
+    import shmali_bot
+    from scoring_pool import get_scoring_pool
+    from spotify_api import get_client
+    from telegram import Update
+
+    # ה-workers עצמם כבר תופסים את הליבות - בלי pool תהליכים נוסף בכל אחד
+    get_scoring_pool(size=0)
+    # מגבלת הקצב של Spotify היא לכל האפליקציה - כל worker מקבל חלק שווה ממנה
+    get_client(processes=worker_count)
+    # מאגרי ההמלצות נבנים ב-worker הראשון בלבד; השאר טוענים אותם מהדיסק המשותף
+    bot = shmali_bot.ShmaliBot(shared_catalog=True, build_pools=index == 0)
+    app = shmali_bot.build_application(bot, updater=False)
+    async with app:
+        await app.start()
+        # בלי updater אין post_init - מפעילים את עבודת הרקע כאן
+        await shmali_bot.report_startup(app)
+        print(f"👷 Worker {index} ready (pid {os.getpid()})")
+        while True:
+            data = await asyncio.to_thread(updates.get)
+            if data is None:
+                break
+            await app.update_queue.put(Update.de_json(json.loads(data), app.bot))
+        # stop() מחכה לעדכונים שכבר בטיפול
+        await app.stop()
+        await shmali_bot.close_connections(app)
+
+
+class UpdateRouter:
+    """תהליך החזית: עדכון -> ה-worker שאחראי על המשתמש. worker שנפל מופעל מחדש (המצב שלו בזיכרון אובד)"""
+
+    def __init__(self, worker_count=WORKER_COUNT):
+        # spawn ולא fork - בתהליך החזית כבר רצים threads (מעקב הקטלוג)
+        self.context = multiprocessing.get_context('spawn')
+        self.queues = [self.context.Queue() for _ in range(worker_count)]
+        self.processes = [None] * worker_count
+        self.ring = HashRing(range(worker_count))
+        self.routed = [0] * worker_count
+
+    def _start_worker(self, index):
+        process = self.context.Process(target=run_worker, args=(index, self.queues[index], len(self.queues)),
+                                       name=f'shmali-worker-{index}', daemon=True)
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(len(self.processes)):
+            self._start_worker(index)
+
+    def worker_for(self, update):
+        owner = update.effective_user or update.effective_chat
+        return self.ring.node_for(owner.id if owner is not None else 0)
+
+    async def forward(self, update, context):
+        index = self.worker_for(update)
+        if not self.processes[index].is_alive():
+            print(f"⚠️ Worker {index} stopped (exit code {self.processes[index].exitcode}) - restarting")
+            self._start_worker(index)
+        self.queues[index].put(update.to_json())
+        self.routed[index] += 1
+
+    def stop(self, timeout=WORKER_STOP_TIMEOUT):
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        print(f"📬 Routed updates per worker: {self.routed}")
+
+
+def prepare_shared_catalog(csv_path, out_dir=CATALOG_DIR):
+    """בנייה של הקטלוג הבינארי אם הוא חסר או ישן, ומעקב שבונה אותו מחדש כשה-CSV משתנה.
+    ה-workers טוענים מחדש כשה-manifest מתחלף"""
+    if load_catalog(out_dir, csv_path) is None and os.path.exists(csv_path):
+        build_catalog(csv_path, out_dir, previous=load_catalog(out_dir))
+
+    watcher = CatalogReloader(csv_path, lambda: build_catalog(csv_path, out_dir, previous=load_catalog(out_dir)))
+    watcher.start()
+    return watcher
+
+
+def serve(worker_count=WORKER_COUNT):
+    """הפעלת החזית וה-workers (חוסם עד העצירה)"""
+    import shmali_bot
+    from telegram import Update
+    from telegram.ext import ApplicationBuilder, TypeHandler
+
+    started = time.perf_counter()
+    watcher = prepare_shared_catalog(shmali_bot.DATASET_CSV)
+    router = UpdateRouter(worker_count)
+    router.start()
+    shmali_bot.record_startup_phase('workers', started)
+
+    async def stop_workers(application):
+        watcher.stop()
+        router.stop()
+
+    # החזית רק מנתבת - כל עדכון הוא הכנסה לתור, אין צורך בעיבוד מקבילי כאן
+    app = ApplicationBuilder().token(shmali_bot.TELEGRAM_TOKEN).post_shutdown(stop_workers).build()
+    app.add_handler(TypeHandler(Update, router.forward))
+    print(f"🚀 SHMALI Bot מתחיל עם {worker_count} workers")
+    shmali_bot.run_updates(app)
+
+
+def _bench_worker(catalog_dir, seconds, ready, results):
+    from text_similarity import DEFAULT_COMPARISON_QUERIES
+
+    catalog = load_catalog(catalog_dir)
+    analyses = [
+        {'topics': [query], 'keywords': [], 'language_preference': language, 'duration_max': duration}
+        for query in DEFAULT_COMPARISON_QUERIES for language in ('hebrew', 'english') for duration in (None, 30)
+    ]
+    ready.wait()
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        catalog.score(analyses[count % len(analyses)])
+        count += 1
+    results.put(count)
+
+
+def benchmark(max_workers=WORKER_COUNT, catalog_dir=CATALOG_DIR, seconds=BENCH_SECONDS):
+    """תפוקת הדירוג המקומי (בקשות לשנייה) ב-1..N תהליכים על אותו קטלוג ממופה"""
+    if load_catalog(catalog_dir) is None:
+        raise SystemExit(f"❌ אין קטלוג בינארי ב-{catalog_dir} - python binary_catalog.py build")
+
+    context = multiprocessing.get_context('spawn')
+    baseline = None
+    for workers in sorted({1, 2, 4, max_workers} & set(range(1, max_workers + 1))):
+        # כל התהליכים מתחילים למדוד יחד, אחרי שכולם טענו את הקטלוג
+        ready, results = context.Barrier(workers + 1), context.Queue()
+        processes = [context.Process(target=_bench_worker, args=(catalog_dir, seconds, ready, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        ready.wait()
+        total = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+
+        throughput = total / seconds
+        baseline = baseline or throughput
+        print(f"{workers} workers: {throughput:.0f} req/s (x{throughput / baseline:.2f})")
+
+
+if __name__ == '__main__':
+    # שימוש: python workers.py [serve|bench] [workers]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'serve'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else WORKER_COUNT
+    if command == 'serve':
+        serve(count)
+    elif command == 'bench':
+        benchmark(count)
+    else:
+        raise SystemExit(f"Unknown command: {command}")